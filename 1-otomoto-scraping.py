@@ -3,224 +3,233 @@
 # it's needed because we use Polish language in our code.
 
 # Before importing any packages visible below, we need to make sure it's installed using 'pip install ...'
-import requests # will be used for making http requests from our scraper
-import time # to make sure we are not banned by otomoto server, we'll be using 'sleep' method between each request
-from bs4 import BeautifulSoup # html parser package
+import os # used for reading optional settings from environment variables
+import atexit # used for making sure buffered offers are saved even if our scraper stops unexpectedly
 from pymongo import MongoClient # MongoDB client for Python - allows to communicate with Mongo directly from Python
 # If needed we can use MongoDB Compass desktop app (GUI) for nice data preview
-
+import otomoto_fetch # our own helpers for downloading pages concurrently, with keep-alive connections and a rate limiter
+import otomoto_storage # our own helpers for working with 'offers' collection, such as checking for duplicated offers
+import otomoto_parser # our own parsing of list pages and offers' details pages
+import otomoto_archive # our own archive of downloaded pages, so they can be parsed again without scraping
+import otomoto_metrics # our own timers and counters, which show us where our scraper spends its time
+
+
+# 'metrics' collects timings of each stage (list fetch, detail fetch, parse, dedup and DB write) and counters,
+# such as saved offers, HTTP statuses and items which failed to convert
+metrics = otomoto_metrics.Metrics()
+# 'metrics_interval' variable takes the amount of seconds between short summaries of our 'metrics' printed while scraping
+metrics_interval = 60
+# 'metrics_path' variable takes the file where our 'metrics' are saved in Prometheus text format (each time a summary is printed)
+# By default they are not saved, it can be switched on with 'OTOMOTO_METRICS' environment variable
+metrics_path = os.environ.get('OTOMOTO_METRICS')
+# 'verbose' variable switches on printing of each offer, as we used to do (it can be switched on with 'OTOMOTO_VERBOSE=1')
+# Printing of about 100k offers costs time too, so by default we only print the summaries
+verbose = os.environ.get('OTOMOTO_VERBOSE', '0') == '1'
+
+
+# Printing a message only in 'verbose' mode
+def log(message):
+    if (verbose):
+        print(message)
+
+
+# 'parser_workers' variable takes the amount of processes which parse offers' details pages (0 means parsing in this process)
+parser_workers = 4
+# Creating our 'parser_pool' which parses offers' details pages in separate processes, while our 'fetcher' keeps downloading
+# It has to be created first, because it's not safe to start new processes once we have threads running
+# (both our 'fetcher' and MongoDB client start their own threads)
+parser_pool = otomoto_parser.ParserPool(parser_workers, metrics=metrics)
 
 # After all packages are imported we can start by setting up a connection with our Database:
 client = MongoClient() # in our case we don't need to provide any additional parameters because Mongo server is running on defaults
 db = client.otomoto # connecting to our 'otomoto' database
 offers = db.offers # creating 'offers' collection in our 'otomoto' database
 
+# It's a good approach to check whether a particular offer was already downloaded, if so, we don't want to have any duplications
+# Some times this situation can take place because while we scrape pages, people add offers, so they'll move accross pages
+# 'deduplicator' keeps a unique index on 'Otomoto id' and checks all offers of a list page with a single query
+deduplicator = otomoto_storage.OfferDeduplicator(offers)
+deduplicator.ensure_index()
+# 'checkpoints' remembers the last page we finished, it's stored in 'checkpoints' collection of our 'otomoto' database
+checkpoints = otomoto_storage.CheckpointStore(db.checkpoints)
+# 'dead_letters' keeps pages which could not be downloaded or parsed, even after a few attempts, in 'dead_letters' collection
+# Instead of stopping our whole crawl, such a page costs us just one offer, which can be tried again with 'otomoto-replay-dead-letters.py'
+dead_letters = otomoto_storage.DeadLetterQueue(db.dead_letters, metrics=metrics)
+
 # Our 'Base' url contains only sorting 'by newest' offers and has a prepared 'page' param which will be fed in our 'for' loop
 url = 'https://www.otomoto.pl/osobowe/?search%5Border%5D=created_at_first%3Adesc&search%5Bbrand_program_id%5D%5B0%5D=&search%5Bcountry%5D=&page='
-
-# Some items on offer details page are clickable, so they have a little bit different DOM structure, we need to distinguish it, to make it working
-link_items_as_href = ['Oferta od', 'Kategoria', 'Marka pojazdu', 'Model pojazdu', 'Rodzaj paliwa', 'Napęd', 'Typ', 'Kolor',
-                      'Metalik', 'Perłowy', 'VAT marża', 'Kraj pochodzenia', 'Pierwszy właściciel', 'Serwisowany w ASO', 'Stan',
-                      'Wersja', 'Skrzynia biegów', 'Bezwypadkowy', 'Akryl (niemetalizowany)', 'Faktura VAT', 'Zarejestrowany w Polsce',
-                      'Używane', 'Filtr cząstek stałych', 'Kod Silnika', 'Możliwość finansowania', 'Leasing', 'Uszkodzony', 'Tuning',
-                      'Matowy', 'Homologacja ciężarowa', 'Zarejestrowany jako zabytek', 'Kierownica po prawej (Anglik)']
-# Some item are out of the box ready to be converted to Integers, so also distinguishing it
-convert_to_int = ['Liczba drzwi', 'Liczba miejsc', 'Rok produkcji']
-
-# 'pages' variable takes the amount of pages we want to go through - each page has 32 offers
+# The 'Base' url can be overridden with 'OTOMOTO_URL' environment variable, for example to scrape another category of offers
+url = os.environ.get('OTOMOTO_URL', url)
+# 'fetch_host' variable (optional, 'OTOMOTO_HOST' environment variable) sends all our requests, list pages and offers' details pages alike,
+# to another host, for example to our local stand-in server which serves previously recorded pages ('otomoto-local-server.py'):
+#   OTOMOTO_HOST=http://127.0.0.1:8080 python 1-otomoto-scraping.py
+# Offers are still saved with their real Otomoto urls
+fetch_host = os.environ.get('OTOMOTO_HOST')
+
+# 'pages' variable takes the maximum amount of pages we want to go through - each page has 32 offers
+# We also stop earlier, as soon as a list page comes without any offers
 pages = 3114
+# 'incremental' variable switches between two modes of our scraper (it can be switched on with 'OTOMOTO_INCREMENTAL=1'):
+# - full crawl (False) goes through all the pages, and if it was interrupted, it continues from the last saved checkpoint
+# - incremental crawl (True) always starts from the first page and stops at the first page which contains only offers we already have,
+#   since offers are sorted 'by newest', all the following pages would contain known offers too - that's how we do a quick refresh
+incremental = os.environ.get('OTOMOTO_INCREMENTAL', '0') == '1'
+# 'checkpoint_every' variable takes the amount of pages after which we save all waiting offers and record a checkpoint
+checkpoint_every = 10
 # 'count' variable is just a helper which shows us how many records we have already downloaded
 count = 0
+# 'concurrency' variable takes the amount of offer's details pages we download at the same time
+concurrency = 8
+# 'requests_per_second' variable limits how many requests in total we send to Otomoto server, so it does not ban us
+# It replaces half a second of 'sleep' we used to have after each offer
+requests_per_second = 4
+# 'batch_size' variable takes the amount of offers we save to the database at once
+batch_size = 500
+# 'flush_interval' variable takes the amount of seconds after which offers are saved, even if we have less than 'batch_size' of them
+flush_interval = 10
+# 'archive_directory' variable takes the directory where all downloaded pages are saved to, so they can be parsed again by 'otomoto-reparse.py'
+# By default pages are not saved, it can be switched on with 'OTOMOTO_ARCHIVE' environment variable
+archive_directory = os.environ.get('OTOMOTO_ARCHIVE')
+
+# Creating our 'fetcher' which holds keep-alive connections to Otomoto server, a pool of workers and a rate limiter
+# Each request has a timeout, failed requests are repeated a few times, and our rate limiter slows down when Otomoto asks us to
+fetcher = otomoto_fetch.Fetcher(concurrency=concurrency, requests_per_second=requests_per_second, metrics=metrics, host=fetch_host)
+# Creating our 'writer' which collects offers and saves them to the database in batches
+writer = otomoto_storage.BulkOfferWriter(offers, batch_size=batch_size, flush_interval=flush_interval, metrics=metrics)
+# If our scraper crashes or is stopped, we still want to save offers which are waiting in the 'writer'
+atexit.register(writer.close)
+# Creating our 'archive', only if we want to save downloaded pages
+archive = otomoto_archive.PageArchive(archive_directory) if archive_directory else None
+
+# In full crawl mode we continue right after the last page recorded in our checkpoint (or from the first page if there is none)
+# Some offers may have moved to other pages in the meantime, but those we already have will be skipped anyways
+first_page = 1 if incremental else checkpoints.load().get('last_page', 0) + 1
+print('Starting from page ' + str(first_page))
 
 # We start by creating a loop which will go through a range of pages
-for page in range(1, pages):
-    # Using a 'requests' library we get a response of a page with 32 offers
+for page in range(first_page, pages):
+    # Using our 'fetcher' we get a response of a page with 32 offers
     # Prior to the request, of course, we should concatenate our 'url' and a 'page' number
-    response = requests.get(url + str(page))
-
-    # Using 'BeautifulSoup' library we parse our response and make it ready to be worked with
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # At this step we are looking for all 'contents' / offers on a list page
-    # Each offer has basic information like: mini photo, price, short description, some parameters and location
-    contents = soup.findAll('div', class_='offer-item__content')
-
-    # Then we go through each 'content' / offer
-    for content in contents:
-        # Creating an empty dictionary which will temporarly hold data before saving it to MongoDB database
-        db_record = {}
-        
-        # Being on the list page, first thing we are interested in, is an url which will lead us to the offer's details page
-        link = content.find('a', class_='offer-title__link')
-        # Assigning a link of an offer to 'link_url' variable since we'll be using it several times in the code
-        link_url = link.get('href')
-        # Similarly to the previuos one, making a request and getting data for offer's details page
-        link_response = requests.get(link_url)
+    # If it could not be downloaded, even after a few attempts, we put it aside in our 'dead_letters' and go to the next page
+    try:
+        response = fetcher.get(url + str(page), stage='list_fetch')
+    except otomoto_fetch.FetchError as error:
+        print(str(error))
+        dead_letters.add(url + str(page), 'list_fetch', error.reason)
+        continue
+    # Saving the list page in our archive
+    if (archive):
+        archive.add('list', url + str(page), response)
+
+    # Using our 'otomoto_parser' we parse our response and pull all offers from it
+    # Each offer comes with an url which will lead us to the offer's details page, its id, price and location
+    # Offers which could not be parsed are skipped, we just count them
+    list_failures = []
+    items = otomoto_parser.parse_list_page(response.text, failures=list_failures)
+    if (list_failures):
+        metrics.increment('parse_errors', len(list_failures), reason='list item')
+    # If there are no offers at all, we went through all the pages there are
+    if (not items and not list_failures):
+        break
+
+    # Knowing ids of all offers on a page, we can ask our database about all of them at once
+    # It's also a good approach to make this check as early, as possible - so we don't even download details of offers we already have
+    page_ids = [item['id'] for item in items if item['id']]
+    with metrics.timer('dedup'):
+        new_ids = set(deduplicator.filter_new(page_ids))
+    # Leaving only offers which are new, or which id we could not find on a list page (those are checked once again below)
+    items = [item for item in items if not item['id'] or item['id'] in new_ids]
+    # In incremental mode, a page which contains only offers we had before this run started, means we caught up with our database
+    # Offers we saved a moment ago don't count - while we scrape, new offers push older ones to the next pages,
+    # so a page full of offers we've just saved can be followed by new offers we have not seen yet
+    if (incremental and not items and page_ids and deduplicator.stored_before(page_ids)):
+        print('No new offers on page ' + str(page) + ', stopping')
+        break
+
+    # Making requests and getting data for all offers' details pages
+    # All of them are downloaded concurrently by our 'fetcher' workers, responses come back in the same order as 'items'
+    link_responses = fetcher.get_all([item['url'] for item in items])
+    # Offers which could not be downloaded are put aside in our 'dead_letters', together with their data from the list page
+    fetched = []
+    for item, link_response in zip(items, link_responses):
+        if (isinstance(link_response, otomoto_fetch.FetchError)):
+            log(str(link_response))
+            dead_letters.add(item['url'], 'detail_fetch', link_response.reason, item)
+        else:
+            fetched.append((item, link_response))
+    # Saving all offers' details pages in our archive
+    if (archive):
+        archive.add_all('detail', [item['url'] for item, link_response in fetched], [link_response for item, link_response in fetched])
+    # Then all of them are parsed in our 'parser_pool', each one into a dictionary of offer's data
+    parsed_offers = parser_pool.parse_offers([link_response.text for item, link_response in fetched])
+
+    # Then we go through each offer from the list page together with its parsed details page
+    for (item, link_response), parsed_offer in zip(fetched, parsed_offers):
         # In my code I use 'print' method very often, it helps tracking and easily debugging when something goes wrong
+        # Now it's done only in 'verbose' mode, otherwise our 'metrics' summaries show us how we are doing
         # Printing offer's details url
-        print(link_url)
-
-        # Similarly to the previuos one, parsing our response
-        link_soup = BeautifulSoup(link_response.text, 'html.parser')
-        # In our parsed offer's details page looking for 'date' and 'otomoto id' items
-        link_date_and_id = link_soup.find('div', class_='offer-content__rwd-metabar').findAll('span', class_='offer-meta__value')
-        # There are only two elements with 'offer-content__rwd-metabar' class
-        # After inspecting the page, we know that 'otomoto id' is stored under second element
-        # There were no other way to pull this data since it didn't have any unique id
-        link_id = link_date_and_id[1].string.strip()
-        # Printing 'otomoto id'
-        print(link_id)
-
-        # It's a good approach to check whether a particular offer was already downloaded, if so, we don't want to have any duplications
-        # Some times this situation can take place because while we scrape pages, people add offers, so they'll move accross pages
-        # It's also a good approach to make this check as early, as possible - so we don't waste our time on data modifications which won't be saved anyways
-        if (offers.find_one({'otomoto_id': link_id})):
+        log(item['url'])
+        # A page which could not be parsed is put aside in our 'dead_letters' too (for example an offer which was removed in the meantime)
+        if (isinstance(parsed_offer, otomoto_parser.ParseError)):
+            reason = str(parsed_offer) if link_response.status_code == 200 else 'HTTP ' + str(link_response.status_code)
+            log('DID NOT parse: ' + reason)
+            dead_letters.add(item['url'], 'parse', reason, item)
+            continue
+        # 'otomoto id' taken from offer's details page
+        link_id = parsed_offer[u'Otomoto id']
+
+        # Most of duplicated offers were already skipped on the list page, but an offer may show up twice on the same page,
+        # so we check once more against ids we already know - and if its id was not found on the list page, we ask our database too
+        with metrics.timer('dedup'):
+            duplicated = deduplicator.is_known(link_id) or (link_id != item['id'] and not deduplicator.filter_new([link_id]))
+        if (duplicated):
             # Printing a message that a record was not saved in the database because the same one was already there
-            print('DID NOT save!')
-            # By calling 'continue' we skip the rest of the code and going to the next offer in our 'for loop' 
+            log('DID NOT save!')
+            metrics.increment('duplicates', stage='dedup')
+            # By calling 'continue' we skip the rest of the code and going to the next offer in our 'for loop'
             continue
 
-        # Once we make sure an offer is not yet in our database, we can prepare the rest of the data of this offer
-        # Pulling a date when an offer was added to Otomoto
-        link_date = link_date_and_id[0].string.strip()
-        # Printing 'Data publikacji' date
-        print(link_date)
-
-        # Looking for 'location' items which contains both, 'state' (województwo) and 'city' (miasto)
-        # Since the format is as followed: 'Warszawa (Mazowieckie)' - the best way is to just split by '('
-        location = content.find('span', class_='offer-item__location').h4.text.split('(')
-        # First element is 'city' (miasto), removing side spaces
-        city = location[0].strip()
-        # Second element is 'state' (województwo), removing ')' and side spaces
-        state = location[1].replace(')', '').strip()
-        # Printing 'city' (miasto)
-        print(city)
-        # Printing 'state' (województwo)
-        print(state)
-        
-        # Looking for 'price' and making basic modifications
-        # Removing 'PLN' substring, spaces and new lines
-        price = content.find('span', class_='offer-price__number').text.replace('PLN', '').replace(' ', '').replace('\n', '')
-        # Printing 'price' (cena)
-        print(price)
-
-        # Not often, but some prices are given in other currencies that PLN
-        # In case when 'price' is in 'EUR' we want to...
-        if ('EUR' in price):
-            # ... we want to remove 'EUR' in string as well as replace comas with dots, convert to Float, calculate PLN and then convert to Integer
-            price = int(float(price.replace('EUR', '').replace(',', '.'))*4.27)
-        # In case when 'price' is in 'USD' we want to...
-        elif ('USD' in price):
-            # ... we want to remove 'USD' in string as well as replace comas with dots, convert to Float, calculate PLN and then convert to Integer
-            price = int(float(price.replace('USD', '').replace(',', '.'))*3.74)
-        else:
-            # In any other cases, since we already know we deal with PLN, we just want to replace comas with dots and save as is
-            price = int(float(price.replace(',', '.')))
-        
-        # Looking for all basic information items on offer's details page
-        # Such us Year, Make, Model and so on
-        link_items = link_soup.findAll('li', class_='offer-params__item')
-        
-        # Iterating through all the basic informations on offer's details page
-        for link_item in link_items:
-            # For each item we want to pull 'key', which can be for example 'Year' or 'Make'
-            key = link_item.span.string.strip()
-            # And for each 'key' we also want to have value itself, which can be '2010' or 'Audi' respectively
-            value = link_item.div
-            # Printing 'key' of the current iteration of items
-            print(key)
- 
-            # At this step we want to check if current 'value' of an 'item' is a string, or a link - for both we needed to have different flows
-            # Also coding is not working by default, we cannot compare simple strings with unicode text, so it's better to encode manually
-            # We are doing this comparison by checking in pre defined 'link_items_as_href' variable which contains all known links in items
-            if (key.encode('utf-8') in link_items_as_href):
-                # Printing  'value' of the current iteration of items
-                print(value.a.string.encode('utf-8').strip())
-                # Items that has 'values' as 'Yes' ('Tak' in polish) we want to convert right away and store in our database as just 1 (one)
-                if (value.a.string.encode('utf-8').strip() == 'Tak'):
-                    # Adding 'key' and 'value' (as 1) pair to our previously defined 'db_record' variable
-                    db_record.update( {key.encode('utf-8') : 1} )
-                else:
-                    # If 'value' is not 'Tak', we want to store real value
-                    # Prior to adding to our 'db_record' variable, you can see many times we always 'encode' strings and if needed 'strip' all the spaces
-                    db_record.update( {key.encode('utf-8') : value.a.string.encode('utf-8').strip()} )
-            else:
-                # If our item is not link, we have a different flow for that
-                # Printing 'value' of the current iteration of items
-                print(value.string.encode('utf-8').strip())
-                # In this flow, different 'keys' has also different flows
-                # In case when the 'key' is 'Przebieg' we want to...
-                if (key.encode('utf-8') == 'Przebieg'):
-                    # ... we want to encode, remove 'km' in string as well as all the spaces and new lines, at the end we convert to Integer
-                    db_record.update( {key.encode('utf-8') : int(value.string.encode('utf-8').replace('km', '').replace(' ', '').replace('\n', ''))} )
-                # In case when the 'key' is 'Pojemność skokowa' we want to...
-                elif (key.encode('utf-8') == 'Pojemność skokowa'):
-                    # ... we want to encode, remove 'cm3' in string as well as all the spaces and new lines, at the end we convert to Integer
-                    db_record.update( {key.encode('utf-8') : int(value.string.encode('utf-8').replace('cm3', '').replace(' ', '').replace('\n', ''))} )
-                # In case when the 'key' is 'Moc' we want to...
-                elif (key.encode('utf-8') == 'Moc'):
-                    # ... we want to encode, remove 'KM' in string as well as all the spaces and new lines, at the end we convert to Integer
-                    db_record.update( {key.encode('utf-8') : int(value.string.encode('utf-8').replace('KM', '').replace(' ', '').replace('\n', ''))} )
-                # In case when the 'key' is 'Emisja CO2' we want to...
-                elif (key.encode('utf-8') == 'Emisja CO2'):
-                    # ... we want to encode, remove 'g/km' in string as well as all the spaces and new lines, at the end we convert to Integer
-                    db_record.update( {key.encode('utf-8') : int(value.string.encode('utf-8').replace('g/km', '').replace(' ', '').replace('\n', ''))} )
-                # In case when the 'key' is just a number (we predefined this values in 'convert_to_int' variable) we want to...
-                elif (key.encode('utf-8') in convert_to_int):
-                    # ... we want to encode, remove all the side spaces and convert to Integer
-                    db_record.update( {key.encode('utf-8') : int(value.string.encode('utf-8').strip())} )
-                else:
-                    # In any other cases we just want to remove all the side spaces and save as is
-                    db_record.update( {key.encode('utf-8') : value.string.encode('utf-8').strip()} )
-
-        # In our parsed offer's details page looking for 'feature' items
-        # These items are what a car is equipped with, such as ' Anti Blockier System', 'CD changer' or 'Air Conditioning'
-        features = link_soup.find('div', class_='offer-features')
-        # If no features provided, parser crashes, so we want to protect ourselves from such eventualities by including the below 'if' statement
-        if (features != None):
-            # Looking for all 'list' items in our features
-            features = features.findAll('li', class_='offer-features__item')
-            # Iterating through all found features
-            for feature in features:
-                # Concatenating 'Wyposażenie: ' word and 'feature' itself
-                # 'Wyposażenie: ' word will help us to distinguish these items from others base features such as 'year', 'make' and so on
-                feature = 'Wyposażenie: ' + feature.text.encode('utf-8').strip()
-                # Printing full 'feature' message that will be stored in the database
-                print(feature)
-                # Adding our 'feature' to our previously defined 'db_record' variable
-                # Similarly to the 'link_items' few lines above, with a simple value 1 (one)
-                db_record.update( {feature : 1} )
-        
-        # Last but not least looking for full description
-        # Full descriptions could be a good dataset for Data Mining project
-        description = link_soup.find('div', class_='offer-description').div.text.strip()
-        # Printing full description
-        print(description)
-
-        # At the end, before saving to the database our previously defined and updated along the way 'db_record' variable
-        # We want to print a link to the offer to make sure if something brakes, we can debug
-        print(link_url)
-
-        # Finally adding the rest of general information to our 'db_record' variable
-        db_record.update({'Otomoto id': link_id,
-                          'Data publikacji': link_date,
-                          'Cena': price,
-                          'Miasto': city,
-                          'Wojewodztwo': state,
-                          'Url': link_url,
-                          'Opis': description })
-        # Saving to the MongoDB database
-        offers.insert_one(db_record)
-        # Printing a message that a record was saved successfully
-        print('saved!')
+        # Putting together data from the list page and from offer's details page
+        db_record = otomoto_parser.build_record(item, parsed_offer)
+        # Passing our record to the 'writer', which saves it to the MongoDB database together with other offers
+        # Thanks to the unique index, our database refuses an offer which somehow was already saved, the 'writer' just skips such offers
+        writer.add(db_record)
+        # Remembering the offer, so it's not saved again if it moves to the next page while we scrape
+        deduplicator.add(link_id)
+        # Printing a message that a record was passed to be saved successfully
+        log('saved!')
 
         # Since one iteration is almost complete here, incrementing our 'count' helper by 1
         count += 1
         # Printing current 'count' number so we could see how many records were already saved to the database
-        print(count)
-        # This line is not necessary, but recommended to use so Otomoto server does not ban us
-        # Adding half a second of break before making another request and starting new iteration
-        time.sleep(0.5)
+        log(count)
+
+    # Every few pages we make sure all waiting offers are saved, and only then we record the page as finished
+    # That way a checkpoint never points past offers which were not saved yet
+    if (not incremental and page % checkpoint_every == 0):
+        writer.flush()
+        checkpoints.save(last_page=page)
+
+    # Every 'metrics_interval' seconds we print a short summary of our 'metrics' (and save them, if we want to)
+    if (metrics.maybe_report(metrics_interval) and metrics_path):
+        metrics.dump(metrics_path)
+
+# If we got here, the crawl was finished, so the next full crawl should start from the first page again
+if (not incremental):
+    checkpoints.clear()
+
+# Closing our 'fetcher' - stopping its workers and closing all kept-alive connections
+fetcher.close()
+# Closing our 'parser_pool' - stopping its processes
+parser_pool.close()
+# Saving all offers which are still waiting in our 'writer'
+writer.close()
+# Printing how many offers were saved, how many were skipped as duplicates and how many are waiting in our 'dead_letters'
+print('Saved: ' + str(writer.written) + ', duplicates: ' + str(writer.duplicates) + ', dead letters: ' + str(dead_letters.count()))
+# Printing the final summary of our 'metrics', and saving them if we want to
+print(metrics.summary())
+if (metrics_path):
+    metrics.dump(metrics_path)
 
 # Printing a message that all iterations, through all the pages we wanted to go through (stored in 'pages' variable) are DONE!
 print('!!!!END!!!!')
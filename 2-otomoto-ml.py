@@ -5,17 +5,16 @@
 # Before importing any packages visible below, we need to make sure it's installed using 'pip install ...'
 from pymongo import MongoClient # MongoDB client for Python - allows to communicate with Mongo directly from Python
 # If needed we can use MongoDB Compass desktop app (GUI) for nice data preview
-import pandas as pd # needed for creating data sets and data frames
 import numpy as np # needed for mathematical functions in Machine Learning
 import matplotlib.pyplot as plt # we'll use it for data visualisation when needed to discover data
-from sklearn.linear_model import LinearRegression # importing Linear Regression model
-from sklearn.model_selection import train_test_split # usefull tool for splitting data into 'train' and 'test' sets
-from sklearn.tree import DecisionTreeRegressor # importing Decision Tree Regressor model
-from sklearn.neural_network import MLPRegressor # importing MLPRegressor model
-from sklearn.ensemble import RandomForestRegressor # importing RandomForestRegressor model
-from sklearn.ensemble import ExtraTreesRegressor # importing ExtraTreesRegressor model
-from sklearn.ensemble import GradientBoostingRegressor # importing GradientBoostingRegressor model
-from sklearn.ensemble import BaggingRegressor # importing BaggingRegressor model
+import time # used for measuring how long training of our saved models takes
+import os # used for checking whether our vocabulary file already exists
+import otomoto_data # our own loading of offers from the database into typed columns
+from otomoto_data import columns_list_categorical, columns_list_to_be_used # column names we use for Machine Learning
+from otomoto_encoder import CategoricalEncoder # our own conversion of categorical data into Integers
+import otomoto_models # our own list of Machine Learning models and a benchmark which compares them
+import otomoto_predict # our own saving of trained models, so they can be used for predicting prices
+import otomoto_snapshot # our own columnar snapshot of training data
 
 
 # After all packages are imported we can start by setting up a connection with our Database:
@@ -23,117 +22,88 @@ client = MongoClient() # in our case we don't need to provide any additional par
 db = client.otomoto # connecting to our 'otomoto' database
 offers = db.offers # creating 'offers' collection in our 'otomoto' database
 
-# Pulling all the offers from our database, converting to 'list' and then creating a DataFrame
-# As a last step, using method 'fillna' filling missing values with zeros (0)
-# When importing data, it was thought out to structure data this way, so zeros here are desired values, not compromised
-df = pd.DataFrame(list(offers.find())).fillna(0)
-
-# Defining a variable that will hold all column names from our database (123 in total)
-# We won't use this variable actually, it's just for our record
-columns_list = df.columns.tolist()
-
-# Splitting collumns into three groups (I did split it manually, so all the values are visible):
-# 1. Categorical once that needs to be converted onto Integer (14 columns)
-columns_list_categorical = ['Marka pojazdu', 'Model pojazdu', 'Kategoria', 'Kolor', 'Kraj pochodzenia', 'Napęd', 'Oferta od', 'Rodzaj paliwa', 'Skrzynia biegów', 'Stan', 'Typ', 'Wersja', 'Miasto', 'Wojewodztwo']
-# 2. The once that we want to use for our Machine Learning processes (95 columns)
-columns_list_to_be_used = ['Akryl (niemetalizowany)', 'Bezwypadkowy', 'Emisja CO2', 'Faktura VAT', 'Filtr cząstek stałych', 'Leasing', 'Homologacja ciężarowa', 'Kierownica po prawej (Anglik)', 'Liczba drzwi', 'Liczba miejsc', 'Metalik', 'Matowy', 'Moc', 'Możliwość finansowania', 'Perłowy', 'Pierwszy właściciel', 'Pojemność skokowa', 'Przebieg', 'Rok produkcji', 'Serwisowany w ASO', 'Tuning', 'Uszkodzony', 'VAT marża', 'Wyposażenie: ABS', 'Wyposażenie: ASR (kontrola trakcji)', 'Wyposażenie: Alarm', 'Wyposażenie: Alufelgi', 'Wyposażenie: Isofix', 'Wyposażenie: Asystent parkowania', 'Wyposażenie: Asystent pasa ruchu', 'Wyposażenie: Bluetooth', 'Wyposażenie: MP3', 'Wyposażenie: CD', 'Wyposażenie: Centralny zamek', 'Wyposażenie: Czujnik deszczu', 'Wyposażenie: Hak', 'Wyposażenie: Czujnik martwego pola', 'Wyposażenie: Czujnik zmierzchu', 'Wyposażenie: Czujniki parkowania przednie', 'Wyposażenie: Czujniki parkowania tylne', 'Wyposażenie: Dach panoramiczny', 'Wyposażenie: ESP (stabilizacja toru jazdy)', 'Wyposażenie: Elektrochromatyczne lusterka boczne', 'Wyposażenie: Elektrochromatyczne lusterko wsteczne', 'Wyposażenie: Elektryczne szyby przednie', 'Wyposażenie: Elektryczne szyby tylne', 'Wyposażenie: Gniazdo USB', 'Wyposażenie: Elektrycznie ustawiane fotele', 'Wyposażenie: Elektrycznie ustawiane lusterka', 'Wyposażenie: Gniazdo AUX', 'Wyposażenie: Gniazdo SD', 'Wyposażenie: HUD (wyświetlacz przezierny)', 'Wyposażenie: Immobilizer', 'Wyposażenie: Kamera cofania', 'Wyposażenie: Klimatyzacja automatyczna', 'Wyposażenie: Klimatyzacja czterostrefowa', 'Wyposażenie: Klimatyzacja dwustrefowa', 'Wyposażenie: Klimatyzacja manualna', 'Wyposażenie: Komputer pokładowy', 'Wyposażenie: Kurtyny powietrzne', 'Wyposażenie: Nawigacja GPS', 'Wyposażenie: Odtwarzacz DVD', 'Zarejestrowany w Polsce', 'Wyposażenie: Ogranicznik prędkości', 'Wyposażenie: Ogrzewanie postojowe', 'Wyposażenie: Podgrzewana przednia szyba', 'Wyposażenie: Podgrzewane lusterka boczne', 'Wyposażenie: Podgrzewane przednie siedzenia', 'Wyposażenie: Radio fabryczne', 'Wyposażenie: Podgrzewane tylne siedzenia', 'Wyposażenie: Poduszka powietrzna chroniąca kolana', 'Wyposażenie: Tuner TV', 'Wyposażenie: Poduszka powietrzna kierowcy', 'Wyposażenie: Poduszka powietrzna pasażera', 'Wyposażenie: Przyciemniane szyby', 'Wyposażenie: Poduszki boczne przednie', 'Wyposażenie: Poduszki boczne tylne', 'Wyposażenie: Radio niefabryczne', 'Wyposażenie: Regulowane zawieszenie', 'Wyposażenie: Relingi dachowe', 'Wyposażenie: System Start-Stop', 'Wyposażenie: Szyberdach', 'Wyposażenie: Tapicerka skórzana', 'Wyposażenie: Tapicerka welurowa', 'Wyposażenie: Tempomat', 'Wyposażenie: Tempomat aktywny', 'Wyposażenie: Wielofunkcyjna kierownica', 'Wyposażenie: Wspomaganie kierownicy', 'Wyposażenie: Zmieniarka CD', 'Wyposażenie: Łopatki zmiany biegów', 'Wyposażenie: Światła LED', 'Wyposażenie: Światła Xenonowe', 'Wyposażenie: Światła do jazdy dziennej', 'Wyposażenie: Światła przeciwmgielne', 'Zarejestrowany jako zabytek']
-# 3. The once that we do not want to use for our Machine Learning processes (13 columns)
-# We won't use this variable actually, it's just for our record
-columns_list_not_to_be_used = ['_id', 'Data publikacji', 'Liczba pozostałych rat', 'Miesięczna rata', 'Numer rejestracyjny pojazdu', 'VIN', 'Kod Silnika', 'Opis', 'Opłata początkowa', 'Otomoto id', 'Pierwsza rejestracja', 'Url', 'Wartość wykupu']
+# 'snapshot_directory' variable takes the directory of a snapshot of our training data, created by 'otomoto-features-snapshot.py'
+# If there is a snapshot, we load offers from it (in seconds), otherwise we load them from our database
+snapshot_directory = 'snapshot'
+# 'vocabulary_path' variable takes the file where codes of our categorical values are saved
+# The same codes are then used when we predict prices and when we train our models again
+vocabulary_path = os.path.join('models', 'vocabulary.json')
+# 'report_path' variable takes the file where results of our models benchmark are saved
+report_path = os.path.join('reports', 'model-benchmark.json')
+# 'workers' variable takes the amount of models trained at the same time (-1 means as many as we have cores)
+# With 1, models are trained one after another, but each of them uses all the cores it can
+workers = -1
+# 'served_model' variable takes the name of the model (from 'otomoto_models.model_registry') which we save for predicting prices
+# It's saved as a bundle in 'models/<name>' directory, which is then loaded by 'otomoto-predict-server.py'
+served_model = 'random_forest_regressor_depth_200'
+# 'saved_models' variable takes names of all the models we save, each one to its own 'models/<name>' directory
+# Saved models are updated with new offers by 'otomoto-retrain.py', instead of being trained from scratch
+saved_models = [served_model, 'linear_regression', 'mlp_regressor']
+
+use_snapshot = os.path.exists(os.path.join(snapshot_directory, 'snapshot.json'))
+if (use_snapshot):
+    # Loading offers from our snapshot, they are already converted exactly the same way as below
+    df = otomoto_snapshot.load_snapshot(snapshot_directory)
+    encoder = CategoricalEncoder.load(vocabulary_path)
+else:
+    # Pulling the offers from our database into a DataFrame
+    # Only the columns we use are sent by the database, in batches, and they are stored as compact 'uint8' / 'int32' columns
+    # Missing values are filled with zeros (0) - when importing data, it was thought out to structure data this way, so zeros here are desired values, not compromised
+    # Column names are split into three groups in 'otomoto_data': categorical ones, the ones we use and the ones we do not use
+    df = otomoto_data.load_offers(offers)
+
+    # Converting our categorical data into Integer
+    # That way instead of ['red', 'blue', 'green'] values, we'll get [1,2,3] values - which is just perfect for Machine Learning algorithms
+    # If we already have a saved vocabulary, we keep its codes and only add values we have not seen yet
+    if (os.path.exists(vocabulary_path)):
+        encoder = CategoricalEncoder.load(vocabulary_path)
+    else:
+        encoder = CategoricalEncoder(columns_list_categorical)
+    # Each column is converted in a single pass, so this step doesn't take a while anymore
+    df = encoder.fit_transform(df)
+    encoder.save(vocabulary_path)
 
 # Selecting 'label' column - the one that we are going to predict
 label = df['Cena']
 
-# Converting our categorical data into Integer
-# We need to iterate through all column with categorical data
-for column in columns_list_categorical:
-    # To make sure all is working correctly, let's decode our strings to utf-8
-    column = column.decode('utf-8')
-    # To be able to convert categorical data into Integer, first we need to know how many values in each column we have
-    # First we peek a desired column from our data frame, then using 'set' method we filter unique values and convert to list
-    unique_values = list(set(df[column]))
-    # 'mapping' variable will serve as a temporary { key: value } dictionary, for example: { red: 1, blue: 2 }
-    mapping = {}
-    # To be able to fill our 'mapping' variable we need to iterate through all unique values
-    for value in unique_values:
-        # Adding { key: value } to our 'mapping' dictionary, where key is our value, and value is value's index
-        # As I mentioned in 'otomoto-scraping.py' file, to accomplish this while importing data it could be very difficult,
-        # but at this point we can see it's just a few lines of code - very easy
-        mapping.update( {value : unique_values.index(value)} )
-    # Last but not least, we need to convert our categorical values in data frame
-    # This step takes a while!
-    df[column] = df[column].replace(mapping)
-    # That way ^^ instead of ['red', 'blue', 'green'] values, we'll first get [0,1,2] values - which is just perfect for Machine Learning algorithms
-
 # One last thing that I found while testing first, LinearRegression model,
-# Some (0 or 1) columns contain few records with not only zero (0) and one (1) values
-# Let's fix it!
-df['Akryl (niemetalizowany)'] = df['Akryl (niemetalizowany)'].replace({ u'acrylic': 1 })
-df['Matowy'] = df['Matowy'].replace({ u'matt': 1 })
-df['Metalik'] = df['Metalik'].replace({ u'metallic': 1 })
+# Some (0 or 1) columns contain few records with not only zero (0) and one (1) values, such as 'acrylic', 'matt' or 'metallic'
+# These are fixed already while loading, in 'otomoto_data'
 
 # Preparing 'final_columns_list' that we'll use for pulling data from data frame
-# To make sure all is working correctly, let's use 'map' method with 'lambda' to decode our strings to utf-8
 # For that we should use our predefined variables with column names: 'columns_list_to_be_used' and 'columns_list_categorical'
-final_columns_list = map(lambda column: column.decode('utf-8'), columns_list_to_be_used + columns_list_categorical)
+final_columns_list = columns_list_to_be_used + columns_list_categorical
 # Pulling data from data frame for Machine Learning models using our new, freshly prepared 'final_columns_list' variable
 train_data = df[final_columns_list]
 
-# Splitting the data into train and test data using 'train_test_split' method
-x_train, x_test, y_train, y_test = train_test_split(train_data, label, test_size=0.1, random_state=2)
+# Splitting the data into train and test data, every 10th offer is used for testing
+# These are always the same offers, also when 'otomoto-retrain.py' updates our saved models later, so all the scores can be compared
+test_mask = otomoto_data.holdout_mask(len(train_data))
+x_train, x_test, y_train, y_test = train_data[~test_mask], train_data[test_mask], label[~test_mask], label[test_mask]
 
 # Few Machine Learning models below!
-
-# LinearRegression:
-linear_regression = LinearRegression()
-linear_regression.fit(x_train, y_train)
-lr_score = linear_regression.score(x_test, y_test)
-print('LinearRegression score: ' + str(lr_score)) # -> 0.6552409768836058
-
-# MLPRegressor:
-mlp_regressor = MLPRegressor()
-mlp_regressor.fit(x_train, y_train)
-mlpr_score = mlp_regressor.score(x_test, y_test)
-print('MLPRegressor score: ' + str(mlpr_score)) # -> 0.8113884821105333
-
-# DecisionTreeRegressor:
-decision_tree_regressor = DecisionTreeRegressor()
-decision_tree_regressor.fit(x_train, y_train)
-dt_score = decision_tree_regressor.score(x_test, y_test)
-print('DecisionTreeRegressor score: ' + str(dt_score)) # -> 0.8642185163401331
-
-# GradientBoostingRegressor:
-gradient_boosting_regressor = GradientBoostingRegressor()
-gradient_boosting_regressor.fit(x_train, y_train)
-gb_score = gradient_boosting_regressor.score(x_test, y_test)
-print('GradientBoostingRegressor score: ' + str(gb_score)) # -> 0.8978408816999488
-
-# ExtraTreesRegressor:
-extra_trees_regressor = ExtraTreesRegressor()
-extra_trees_regressor.fit(x_train, y_train)
-et_score = extra_trees_regressor.score(x_test, y_test)
-print('ExtraTreesRegressor score: ' + str(et_score)) # -> 0.9071302394368891
-
-# BaggingRegressor:
-bagging_regressor = BaggingRegressor()
-bagging_regressor.fit(x_train, y_train)
-b_score = bagging_regressor.score(x_test, y_test)
-print('BaggingRegressor score: ' + str(b_score)) # -> 0.9154010467830169
-
-# RandomForestRegressor:
-random_forest_regressor = RandomForestRegressor()
-random_forest_regressor.fit(x_train, y_train)
-rf_score = random_forest_regressor.score(x_test, y_test)
-print('RandomForestRegressor score: ' + str(rf_score)) # -> 0.920122663462127
-
-# RandomForestRegressor(max_depth=5, random_state=0, n_estimators=100):
-random_forest_regressor = RandomForestRegressor(max_depth=5, random_state=0, n_estimators=100)
-random_forest_regressor.fit(x_train, y_train)
-rf_score_1 = random_forest_regressor.score(x_test, y_test)
-print('RandomForestRegressor(max_depth=5, random_state=0, n_estimators=100) score: ' + str(rf_score_1)) # -> 0.8134829521876554
-
-# RandomForestRegressor(max_depth=200, random_state=100, n_estimators=50):
-random_forest_regressor = RandomForestRegressor(max_depth=200, random_state=100, n_estimators=50)
-random_forest_regressor.fit(x_train, y_train)
-rf_score_2 = random_forest_regressor.score(x_test, y_test)
-print('RandomForestRegressor(max_depth=200, random_state=100, n_estimators=50) score: ' + str(rf_score_2)) # -> 0.9329107755184214
+# All of them are listed in 'otomoto_models.model_registry', they are trained at the same time using all of our cores
+# For each one we print and save to 'report_path' its score, how long it took to train it, how fast it predicts and how big it is
+# Our 'saved_models' are kept once they are trained, so we don't need to train them again below
+keep = [name for name in saved_models if name not in otomoto_models.saved_model_registry]
+results, trained_models = otomoto_models.run_benchmark(otomoto_models.model_registry, x_train, y_train, x_test, y_test, report_path,
+                                                       workers=workers, keep=keep)
+fit_seconds = dict((result['name'], result['fit_seconds']) for result in results)
+
+# Saving our 'saved_models', together with their vocabulary and order of columns
+# Models saved as another class than the one in our benchmark (see 'otomoto_models.saved_model_registry') are trained here,
+# all the others are taken as they were trained by our benchmark
+# If we loaded offers from our snapshot, we also record how many of them we used, so 'otomoto-retrain.py' knows which offers are new
+for name in saved_models:
+    if (name in trained_models):
+        model = trained_models[name]
+    else:
+        model = otomoto_models.saved_model(name)
+        start = time.time()
+        model.fit(x_train, y_train)
+        fit_seconds[name] = time.time() - start
+    metadata = {'name': name, 'score': model.score(x_test, y_test), 'train_rows': len(x_train), 'full_fit_seconds': fit_seconds[name]}
+    if (use_snapshot):
+        metadata['snapshot_rows'] = len(df)
+    # A running 'otomoto-predict-server.py' keeps serving the previous version of the bundle until it is restarted
+    otomoto_predict.save_bundle(os.path.join('models', name), model, encoder, final_columns_list, metadata)
@@ -0,0 +1,40 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Building the corpus of offers' details pages for 'otomoto-parser-benchmark.py' from our archive of downloaded pages
+# Every time it's run, the corpus is built again from the same archive, so our benchmark always measures the same pages
+import os # used for reading optional settings from environment variables and building paths
+import io # used for writing files as utf-8 text in both Python 2 and Python 3
+import glob # used for removing pages of the previous corpus
+import otomoto_archive # our own archive of downloaded pages
+
+
+# 'archive_directory' variable takes the directory our scraper saved pages to, it can be overridden with 'OTOMOTO_ARCHIVE' environment variable
+archive_directory = os.environ.get('OTOMOTO_ARCHIVE', 'archive')
+# 'corpus_directory' variable takes the directory our benchmark reads pages from, it can be overridden with 'OTOMOTO_CORPUS' environment variable
+corpus_directory = os.environ.get('OTOMOTO_CORPUS', 'corpus')
+# 'corpus_size' variable takes the amount of pages in our corpus, the first ones found in the archive are taken
+corpus_size = 500
+
+# Taking the newest version of the first 'corpus_size' offers' details pages which were downloaded successfully
+pages = {}
+order = []
+for record in otomoto_archive.read_archive(archive_directory):
+    if (record['kind'] != 'detail' or record['status'] != 200):
+        continue
+    if (record['url'] not in pages):
+        if (len(order) >= corpus_size):
+            continue
+        order.append(record['url'])
+    pages[record['url']] = record['body']
+
+if (not os.path.isdir(corpus_directory)):
+    os.makedirs(corpus_directory)
+for path in glob.glob(os.path.join(corpus_directory, '*.html')):
+    os.remove(path)
+# Pages are named by their order in the archive, such as '00001.html', so they are always read in the same order
+for number, page_url in enumerate(order, 1):
+    with io.open(os.path.join(corpus_directory, str(number).zfill(5) + '.html'), 'w', encoding='utf-8') as page_file:
+        page_file.write(pages[page_url])
+print('Saved ' + str(len(order)) + ' pages from ' + archive_directory + ' to ' + corpus_directory)
@@ -0,0 +1,24 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Creating or updating a snapshot of our training data, which is then loaded by '2-otomoto-ml.py' in seconds
+# Only offers saved in our database since the last update are loaded and added to the snapshot,
+# so it's a good idea to run this script right after each (for example nightly) run of '1-otomoto-scraping.py'
+# Before importing any packages visible below, we need to make sure it's installed using 'pip install ...'
+import os # used for building paths
+from pymongo import MongoClient # MongoDB client for Python - allows to communicate with Mongo directly from Python
+import otomoto_snapshot # our own columnar snapshot of training data
+
+
+# 'snapshot_directory' variable takes the directory of our snapshot, the same one '2-otomoto-ml.py' loads it from
+snapshot_directory = 'snapshot'
+# 'vocabulary_path' variable takes the file where codes of our categorical values are saved, shared with '2-otomoto-ml.py'
+vocabulary_path = os.path.join('models', 'vocabulary.json')
+
+# Setting up a connection with our Database
+client = MongoClient()
+db = client.otomoto
+offers = db.offers
+
+otomoto_snapshot.update_snapshot(offers, snapshot_directory, vocabulary_path)
@@ -0,0 +1,20 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Serving pages recorded in our archive on a local port, so our scraper can be run (and tested) without touching Otomoto:
+#   python otomoto-local-server.py
+#   OTOMOTO_HOST=http://127.0.0.1:8080 python 1-otomoto-scraping.py
+# Pages are recorded by running our scraper with 'OTOMOTO_ARCHIVE' once
+import os # used for reading optional settings from environment variables
+import otomoto_local_server # our own stand-in for Otomoto server
+
+
+# 'archive_directory' variable takes the directory with recorded pages, it can be overridden with 'OTOMOTO_ARCHIVE' environment variable
+archive_directory = os.environ.get('OTOMOTO_ARCHIVE', 'archive')
+# 'port' variable takes the port our server listens on, it can be overridden with 'OTOMOTO_LOCAL_PORT' environment variable
+port = int(os.environ.get('OTOMOTO_LOCAL_PORT', '8080'))
+
+pages = otomoto_local_server.load_recorded_pages(archive_directory)
+print('Serving ' + str(len(pages)) + ' recorded pages from ' + archive_directory + ' on port ' + str(port))
+otomoto_local_server.make_server(pages, port=port).serve_forever()
@@ -0,0 +1,106 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Benchmark of our offer's details page parsing, run over a fixed corpus of saved html pages
+# It compares the way we used to parse pages (a full 'html.parser' tree and a long 'if / elif' chain for each item)
+# with 'otomoto_parser' settings and with our pool of processes
+# Corpus is just a directory with offers' details pages saved as '.html' files, it can be built from our archive with 'otomoto-build-corpus.py'
+import os # used for listing files in our corpus directory
+import sys # used for stopping when there is nothing to measure
+import io # used for reading files as utf-8 text in both Python 2 and Python 3
+import glob # used for finding all '.html' files in our corpus directory
+import time # used for measuring how long parsing takes
+from bs4 import BeautifulSoup # html parser package, used for the way we used to parse pages
+import otomoto_parser # our own parsing of offers' details pages
+
+
+# 'corpus_directory' variable takes the directory with saved pages, it can be overridden with 'OTOMOTO_CORPUS' environment variable
+corpus_directory = os.environ.get('OTOMOTO_CORPUS', 'corpus')
+# 'rounds' variable takes the amount of times we parse the whole corpus, the best round is reported
+rounds = 3
+# 'pool_workers' variable takes the amount of processes used in the last benchmark
+pool_workers = 4
+
+# Reading all pages of our corpus into memory, so reading files is not included in our measurements
+pages = []
+for path in sorted(glob.glob(os.path.join(corpus_directory, '*.html'))):
+    with io.open(path, encoding='utf-8') as page_file:
+        pages.append(page_file.read())
+print('Pages in corpus: ' + str(len(pages)))
+if (not pages):
+    print('Nothing to measure, the corpus can be built from our archive with otomoto-build-corpus.py')
+    sys.exit(1)
+
+
+# The way '1-otomoto-scraping.py' used to parse offer's details page, before 'otomoto_parser' was written:
+# a full 'html.parser' tree, and each item goes through a long 'if / elif' chain
+# It's kept here only for our benchmark, without 'print' of every item and without 'encode' calls (so it runs in Python 3 too)
+link_items_as_href = [key for key, converter in otomoto_parser.FIELDS.items() if converter is otomoto_parser.yes_to_one]
+convert_to_int = [u'Liczba drzwi', u'Liczba miejsc', u'Rok produkcji']
+
+
+def parse_offer_the_old_way(html):
+    db_record = {}
+    link_soup = BeautifulSoup(html, 'html.parser')
+    link_date_and_id = link_soup.find('div', class_='offer-content__rwd-metabar').find_all('span', class_='offer-meta__value')
+    db_record[u'Otomoto id'] = link_date_and_id[1].string.strip()
+    db_record[u'Data publikacji'] = link_date_and_id[0].string.strip()
+    for link_item in link_soup.find_all('li', class_='offer-params__item'):
+        key = link_item.span.string.strip()
+        value = link_item.div
+        if (key in link_items_as_href):
+            if (value.a.string.strip() == u'Tak'):
+                db_record[key] = 1
+            else:
+                db_record[key] = value.a.string.strip()
+        else:
+            if (key == u'Przebieg'):
+                db_record[key] = int(value.string.replace(u'km', u'').replace(u' ', u'').replace(u'\n', u''))
+            elif (key == u'Pojemność skokowa'):
+                db_record[key] = int(value.string.replace(u'cm3', u'').replace(u' ', u'').replace(u'\n', u''))
+            elif (key == u'Moc'):
+                db_record[key] = int(value.string.replace(u'KM', u'').replace(u' ', u'').replace(u'\n', u''))
+            elif (key == u'Emisja CO2'):
+                db_record[key] = int(value.string.replace(u'g/km', u'').replace(u' ', u'').replace(u'\n', u''))
+            elif (key in convert_to_int):
+                db_record[key] = int(value.string.strip())
+            else:
+                db_record[key] = value.string.strip()
+    features = link_soup.find('div', class_='offer-features')
+    if (features != None):
+        for feature in features.find_all('li', class_='offer-features__item'):
+            db_record[u'Wyposażenie: ' + feature.text.strip()] = 1
+    db_record[u'Opis'] = link_soup.find('div', class_='offer-description').div.text.strip()
+    return db_record
+
+
+# Parsing the whole corpus 'rounds' times with 'parse', returning the best time in seconds
+def measure(parse):
+    best = None
+    for _ in range(rounds):
+        start = time.time()
+        parse(pages)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Each benchmark is a name and a function which parses a list of pages
+benchmarks = [
+    ('the way we used to parse pages: html.parser, full tree, if / elif chain', lambda htmls: [parse_offer_the_old_way(html) for html in htmls]),
+    ('html.parser, full tree, FIELDS table', lambda htmls: [otomoto_parser.parse_offer(html, parser='html.parser', parse_only=None) for html in htmls]),
+    ('html.parser, only needed blocks, FIELDS table', lambda htmls: [otomoto_parser.parse_offer(html, parser='html.parser') for html in htmls]),
+    (otomoto_parser.PARSER + ', full tree, FIELDS table', lambda htmls: [otomoto_parser.parse_offer(html, parse_only=None) for html in htmls]),
+    (otomoto_parser.PARSER + ', only needed blocks, FIELDS table', lambda htmls: [otomoto_parser.parse_offer(html) for html in htmls]),
+]
+
+for name, parse in benchmarks:
+    elapsed = measure(parse)
+    print(name + ': ' + str(round(elapsed, 3)) + 's, ' + str(round(len(pages) / elapsed, 1)) + ' pages/s')
+
+# Our pool of processes is created once, the same way our scraper does it
+parser_pool = otomoto_parser.ParserPool(pool_workers)
+elapsed = measure(parser_pool.parse_offers)
+parser_pool.close()
+print(otomoto_parser.PARSER + ', only needed blocks, FIELDS table, ' + str(pool_workers) + ' processes: ' + str(round(elapsed, 3)) + 's, ' + str(round(len(pages) / elapsed, 1)) + ' pages/s')
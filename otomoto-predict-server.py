@@ -0,0 +1,97 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Local HTTP service which predicts prices of offers, using a model saved by '2-otomoto-ml.py'
+# Offers are sent in the same shape as 'db_record' of our scraper, one offer or a list of offers:
+#   curl -X POST localhost:8000/predict -d '{"Marka pojazdu": "Audi", "Rok produkcji": 2010, "Przebieg": 150000}'
+#   curl -X POST localhost:8000/predict -d '[{"Marka pojazdu": "Audi"}, {"Marka pojazdu": "BMW"}]'
+# Latency percentiles (p50 and p99) of our predictions are published at 'localhost:8000/metrics'
+# The model is loaded once at start, models saved again later by '2-otomoto-ml.py' or 'otomoto-retrain.py'
+# are not picked up - the service has to be restarted to serve them
+import os # used for reading optional settings from environment variables
+import json # requests and responses are JSON
+import time # used for measuring latency
+import otomoto_predict # our own loading of saved models and batching of predictions
+
+# HTTP server modules were renamed in Python 3
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+# 'model_directory' variable takes the bundle saved by '2-otomoto-ml.py', it can be overridden with 'OTOMOTO_MODEL' environment variable
+model_directory = os.environ.get('OTOMOTO_MODEL', os.path.join('models', 'random_forest_regressor_depth_200'))
+# 'port' variable takes the port our service listens on
+port = int(os.environ.get('OTOMOTO_PORT', '8000'))
+# 'max_batch' and 'max_wait' variables decide how many offers are predicted together, and how long we wait to collect them
+max_batch = 64
+max_wait = 0.005
+
+# Loading our model (memory-mapped, see 'PricePredictor.load'), the time it takes is printed, so we can keep an eye on it
+start = time.time()
+predictor = otomoto_predict.PricePredictor.load(model_directory)
+print('Loaded ' + model_directory + ' in ' + str(round(time.time() - start, 3)) + 's')
+
+batcher = otomoto_predict.MicroBatcher(predictor, max_batch=max_batch, max_wait=max_wait)
+latencies = otomoto_predict.LatencyTracker()
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+
+    def send_body(self, status, body, content_type='application/json'):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # 'POST /predict' - predicting prices of one offer (JSON object) or many offers (JSON list)
+    def do_POST(self):
+        if (self.path != '/predict'):
+            return self.send_body(404, json.dumps({'error': 'not found'}))
+        start = time.time()
+        try:
+            offers = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+        except ValueError:
+            return self.send_body(400, json.dumps({'error': 'invalid JSON'}))
+        # Only a single offer (JSON object) or a list of offers (JSON list of objects) can be predicted
+        single = isinstance(offers, dict)
+        if (not single and not (isinstance(offers, list) and all(isinstance(offer, dict) for offer in offers))):
+            return self.send_body(400, json.dumps({'error': 'expected an offer (JSON object) or a list of offers'}))
+        try:
+            prices = batcher.predict([offers] if single else offers)
+        except Exception as error:
+            return self.send_body(500, json.dumps({'error': str(error)}))
+        latencies.add(time.time() - start)
+        self.send_body(200, json.dumps({'price': prices[0]} if single else {'prices': prices}))
+
+    # 'GET /metrics' - latency percentiles in Prometheus text format, 'GET /health' - checking if our service is running
+    def do_GET(self):
+        if (self.path == '/health'):
+            return self.send_body(200, json.dumps({'model': model_directory}))
+        if (self.path != '/metrics'):
+            return self.send_body(404, json.dumps({'error': 'not found'}))
+        lines = ['# TYPE otomoto_predict_latency_seconds summary']
+        for quantile, percent in [('0.5', 50), ('0.99', 99)]:
+            value = latencies.percentile(percent)
+            lines.append('otomoto_predict_latency_seconds{quantile="' + quantile + '"} ' + ('NaN' if value is None else repr(value)))
+        lines.append('otomoto_predict_latency_seconds_count ' + str(latencies.count))
+        self.send_body(200, '\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4')
+
+    # Not printing a line for every request, it would slow our service down
+    def log_message(self, *args):
+        pass
+
+
+# Each request is handled in its own thread, so many requests can wait for the same batch
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+print('Listening on port ' + str(port))
+ThreadingHTTPServer(('', port), PredictionHandler).serve_forever()
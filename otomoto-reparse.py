@@ -0,0 +1,92 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Rebuilding our 'offers' collection from the local archive of pages saved by '1-otomoto-scraping.py'
+# No request is sent to Otomoto here, so when our parsing changes, or a field turns out to be parsed wrong,
+# we just run this script instead of scraping all the offers again
+# Before importing any packages visible below, we need to make sure it's installed using 'pip install ...'
+import os # used for reading optional settings from environment variables
+from pymongo import MongoClient # MongoDB client for Python - allows to communicate with Mongo directly from Python
+import otomoto_archive # our own archive of downloaded pages
+import otomoto_parser # our own parsing of list pages and offers' details pages
+import otomoto_storage # our own helpers for working with 'offers' collection
+
+
+# 'archive_directory' variable takes the directory our scraper saved pages to, it can be overridden with 'OTOMOTO_ARCHIVE' environment variable
+archive_directory = os.environ.get('OTOMOTO_ARCHIVE', 'archive')
+# 'parser_workers' variable takes the amount of processes which parse offers' details pages
+parser_workers = 4
+# 'chunk_size' variable takes the amount of offers' details pages sent to our 'parser_pool' at once
+chunk_size = 256
+# 'drop_collection' variable decides whether we remove all the offers before rebuilding
+# If it's False, offers found in the archive replace the ones with the same 'Otomoto id', all other offers are left as they are
+drop_collection = False
+
+# Creating our 'parser_pool' before connecting to the database, because it's not safe to start new processes once we have threads running
+parser_pool = otomoto_parser.ParserPool(parser_workers)
+
+# Setting up a connection with our Database
+client = MongoClient()
+db = client.otomoto
+offers = db.offers
+
+if (drop_collection):
+    offers.drop()
+# Making sure our unique index on 'Otomoto id' exists, also after the collection was dropped
+otomoto_storage.OfferDeduplicator(offers).ensure_index()
+# Offers which can't be parsed are skipped and put aside in 'dead_letters' collection, they can be downloaded again with 'otomoto-replay-dead-letters.py'
+dead_letters = otomoto_storage.DeadLetterQueue(db.dead_letters)
+
+# First pass through the archive:
+# - all list pages are parsed, since price and location of an offer are taken from a list page ('items' are kept by offer's url)
+# - for each offer's details page we remember when it was downloaded for the last time, we rebuild offers only from their newest version
+items = {}
+newest = {}
+for record in otomoto_archive.read_archive(archive_directory):
+    if (record['status'] != 200):
+        continue
+    if (record['kind'] == 'list'):
+        for item in otomoto_parser.parse_list_page(record['body']):
+            items[item['url']] = item
+    elif (record['kind'] == 'detail'):
+        newest[record['url']] = max(newest.get(record['url'], 0), record['fetched_at'])
+print('Offers found in the archive: ' + str(len(newest)))
+
+
+# Parsing a chunk of archived offers' details pages in our 'parser_pool' and passing them to our 'writer'
+# Returns the amount of pages which could not be parsed
+def reparse(chunk, writer):
+    failed = 0
+    parsed_offers = parser_pool.parse_offers([record['body'] for record in chunk])
+    for record, parsed_offer in zip(chunk, parsed_offers):
+        if (isinstance(parsed_offer, otomoto_parser.ParseError)):
+            dead_letters.add(record['url'], 'parse', str(parsed_offer), items[record['url']])
+            failed += 1
+            continue
+        writer.add(otomoto_parser.build_record(items[record['url']], parsed_offer))
+    return failed
+
+
+# Second pass through the archive - parsing the newest version of each offer's details page
+# Offers are saved with 'upsert', so each of them replaces an offer with the same 'Otomoto id'
+skipped = 0
+failed = 0
+with otomoto_storage.BulkOfferWriter(offers, upsert=True) as writer:
+    chunk = []
+    for record in otomoto_archive.read_archive(archive_directory):
+        if (record['kind'] != 'detail' or record['status'] != 200 or record['fetched_at'] != newest[record['url']]):
+            continue
+        # Without its list page we don't know offer's price and location, so we can't rebuild it
+        if (record['url'] not in items):
+            skipped += 1
+            continue
+        chunk.append(record)
+        if (len(chunk) >= chunk_size):
+            failed += reparse(chunk, writer)
+            chunk = []
+    failed += reparse(chunk, writer)
+
+parser_pool.close()
+# Printing how many offers were rebuilt, how many were skipped and how many could not be parsed
+print('Saved: ' + str(writer.written) + ', skipped without list page: ' + str(skipped) + ', failed to parse: ' + str(failed))
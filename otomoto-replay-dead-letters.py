@@ -0,0 +1,100 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Trying again the pages which '1-otomoto-scraping.py' (or 'otomoto-reparse.py') put aside in 'dead_letters' collection
+# - list pages are downloaded again and their new offers are added to the offers we try again
+# - offers are downloaded and parsed again, and saved together with their data from the list page, kept in their dead letter
+# An offer which is saved (or turns out to be saved already) is removed from 'dead_letters',
+# an offer which fails again stays there with one more attempt, until it reaches 'max_attempts'
+# Before importing any packages visible below, we need to make sure it's installed using 'pip install ...'
+import os # used for reading optional settings from environment variables
+import atexit # used for making sure buffered offers are saved even if we stop unexpectedly
+from pymongo import MongoClient # MongoDB client for Python - allows to communicate with Mongo directly from Python
+import otomoto_fetch # our own helpers for downloading pages
+import otomoto_storage # our own helpers for working with 'offers' and 'dead_letters' collections
+import otomoto_parser # our own parsing of list pages and offers' details pages
+import otomoto_metrics # our own timers and counters
+
+
+# 'max_attempts' variable takes the amount of failures after which a dead letter is not tried anymore (it stays in the collection to be looked at)
+max_attempts = 5
+# 'chunk_size' variable takes the amount of offers downloaded and parsed at once
+chunk_size = 32
+# 'parser_workers', 'concurrency' and 'requests_per_second' variables work the same way as in '1-otomoto-scraping.py'
+parser_workers = 4
+concurrency = 8
+requests_per_second = 4
+# 'fetch_host' variable (optional) sends all our requests to another host, the same way as in '1-otomoto-scraping.py'
+fetch_host = os.environ.get('OTOMOTO_HOST')
+
+metrics = otomoto_metrics.Metrics()
+# Creating our 'parser_pool' before connecting to the database, because it's not safe to start new processes once we have threads running
+parser_pool = otomoto_parser.ParserPool(parser_workers, metrics=metrics)
+
+# Setting up a connection with our Database
+client = MongoClient()
+db = client.otomoto
+offers = db.offers
+
+deduplicator = otomoto_storage.OfferDeduplicator(offers)
+deduplicator.ensure_index()
+dead_letters = otomoto_storage.DeadLetterQueue(db.dead_letters, metrics=metrics)
+fetcher = otomoto_fetch.Fetcher(concurrency=concurrency, requests_per_second=requests_per_second, metrics=metrics, host=fetch_host)
+writer = otomoto_storage.BulkOfferWriter(offers, metrics=metrics)
+atexit.register(writer.close)
+
+letters = dead_letters.pending(max_attempts)
+print('Dead letters to replay: ' + str(len(letters)))
+
+# List pages go first, each one is downloaded again and all of its offers we don't have yet are tried with the other offers
+# Offers may have moved to other pages since the page failed, those we miss will be picked up by the next incremental crawl
+items = []
+for letter in letters:
+    if (letter['stage'] != 'list_fetch'):
+        items.append(letter['item'])
+        continue
+    try:
+        response = fetcher.get(letter['_id'], stage='list_fetch')
+    except otomoto_fetch.FetchError as error:
+        dead_letters.add(letter['_id'], 'list_fetch', error.reason)
+        continue
+    page_items = otomoto_parser.parse_list_page(response.text)
+    new_ids = set(deduplicator.filter_new([item['id'] for item in page_items if item['id']]))
+    items.extend(item for item in page_items if not item['id'] or item['id'] in new_ids)
+    dead_letters.remove(letter['_id'])
+
+
+# Downloading and parsing a chunk of offers, saving those which succeeded and putting the others back to 'dead_letters'
+def replay(chunk):
+    link_responses = fetcher.get_all([item['url'] for item in chunk])
+    fetched = []
+    for item, link_response in zip(chunk, link_responses):
+        if (isinstance(link_response, otomoto_fetch.FetchError)):
+            dead_letters.add(item['url'], 'detail_fetch', link_response.reason, item)
+        else:
+            fetched.append((item, link_response))
+    parsed_offers = parser_pool.parse_offers([link_response.text for item, link_response in fetched])
+    for (item, link_response), parsed_offer in zip(fetched, parsed_offers):
+        if (isinstance(parsed_offer, otomoto_parser.ParseError)):
+            reason = str(parsed_offer) if link_response.status_code == 200 else 'HTTP ' + str(link_response.status_code)
+            dead_letters.add(item['url'], 'parse', reason, item)
+            continue
+        dead_letters.remove(item['url'])
+        # The offer could have been saved in the meantime, for example by a later crawl
+        link_id = parsed_offer[u'Otomoto id']
+        if (deduplicator.is_known(link_id) or not deduplicator.filter_new([link_id])):
+            continue
+        writer.add(otomoto_parser.build_record(item, parsed_offer))
+        deduplicator.add(link_id)
+
+
+for start in range(0, len(items), chunk_size):
+    replay(items[start:start + chunk_size])
+
+fetcher.close()
+parser_pool.close()
+writer.close()
+# Printing how many offers were saved and how many dead letters are still waiting
+print('Saved: ' + str(writer.written) + ', dead letters left: ' + str(dead_letters.count()))
+print(metrics.summary())
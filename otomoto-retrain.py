@@ -0,0 +1,79 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Updating models saved by '2-otomoto-ml.py' with offers added to our snapshot since they were trained
+# It's meant to be run after each (for example nightly) update of our snapshot by 'otomoto-features-snapshot.py',
+# instead of training all the models from scratch on all the offers again
+# Updated models are swapped in atomically by 'save_bundle', so it's safe to run while 'otomoto-predict-server.py' is running,
+# but the service has no way of reloading its model - it keeps serving the old one until it is restarted
+import os # used for building paths and listing saved models
+import json # our report is saved as a JSON file
+import time # used for measuring how long the whole retraining takes
+import otomoto_data # our own split of offers into training and testing ones
+import otomoto_models # our own list of saved Machine Learning models, used when a model needs to be trained from scratch
+import otomoto_predict # our own loading and saving of trained models
+import otomoto_retrain # our own updating of trained models
+import otomoto_snapshot # our own columnar snapshot of training data
+from otomoto_encoder import CategoricalEncoder # our own conversion of categorical data into Integers
+
+
+# 'snapshot_directory', 'vocabulary_path' and 'models_directory' variables take the same locations '2-otomoto-ml.py' uses
+snapshot_directory = 'snapshot'
+vocabulary_path = os.path.join('models', 'vocabulary.json')
+models_directory = 'models'
+# 'report_path' variable takes the file where results of retraining are saved
+report_path = os.path.join('reports', 'retrain.json')
+# 'min_new_rows' variable takes the least amount of new offers worth updating a model for
+min_new_rows = 100
+
+start = time.time()
+df = otomoto_snapshot.load_snapshot(snapshot_directory)
+encoder = CategoricalEncoder.load(vocabulary_path)
+final_columns_list = otomoto_data.columns_list_to_be_used + otomoto_data.columns_list_categorical
+train_data = df[final_columns_list]
+label = df[otomoto_data.label_column]
+# The same offers are kept aside for testing as in '2-otomoto-ml.py'
+test_mask = otomoto_data.holdout_mask(len(df))
+x_train, y_train = train_data[~test_mask], label[~test_mask]
+x_test, y_test = train_data[test_mask], label[test_mask]
+
+reports = []
+for name in sorted(os.listdir(models_directory)):
+    directory = os.path.join(models_directory, name)
+    # Hidden directories are saved versions of bundles, each bundle is reached through its link
+    if (name.startswith('.') or not os.path.exists(os.path.join(directory, 'bundle.json'))):
+        continue
+    # Models are loaded fully into memory (not memory-mapped), since we are going to change them
+    predictor = otomoto_predict.PricePredictor.load(directory, mmap_mode=None)
+    metadata = predictor.metadata
+    if ('snapshot_rows' not in metadata or metadata.get('name') not in dict(otomoto_models.model_registry)):
+        print(name + ': not trained from our snapshot, skipping')
+        continue
+    # New offers are those added to our snapshot after the model was trained, without the ones kept aside for testing
+    new_mask = ~test_mask
+    new_mask[:metadata['snapshot_rows']] = False
+    if (new_mask.sum() < min_new_rows):
+        print(name + ': only ' + str(new_mask.sum()) + ' new offers, skipping')
+        continue
+
+    model, report = otomoto_retrain.retrain(predictor.model, otomoto_models.saved_model(metadata['name']),
+                                            x_train, y_train, train_data[new_mask], label[new_mask], x_test, y_test,
+                                            full_fit_seconds=metadata.get('full_fit_seconds'))
+    report['name'] = name
+    reports.append(report)
+    print(name + ': ' + report['mode'] + ', score ' + str(report['previous_score']) + ' -> ' + str(report['score'])
+          + (', saved ' + str(round(report['saved_seconds'], 2)) + 's' if 'saved_seconds' in report else ''))
+
+    # Saving the updated model as a new version of its bundle, the old version stays untouched for the running service
+    metadata.update({'score': report['score'], 'train_rows': int((~test_mask).sum()), 'snapshot_rows': len(df)})
+    if (report['mode'] == 'full'):
+        metadata['full_fit_seconds'] = report['full_fit_seconds']
+    otomoto_predict.save_bundle(directory, model, encoder, final_columns_list, metadata)
+
+elapsed = time.time() - start
+print('Retraining took ' + str(round(elapsed, 2)) + 's, saved ' + str(round(sum(report.get('saved_seconds', 0) for report in reports), 2)) + 's compared to training from scratch')
+if (not os.path.isdir(os.path.dirname(report_path))):
+    os.makedirs(os.path.dirname(report_path))
+with open(report_path, 'w') as report_file:
+    json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'rows': len(df), 'total_seconds': elapsed, 'results': reports}, report_file, indent=2)
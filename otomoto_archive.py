@@ -0,0 +1,56 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Local archive of raw pages downloaded by '1-otomoto-scraping.py'
+# Every list page and offer's details page is appended to a compressed file together with its url, status and time it was downloaded,
+# so when our parsing changes, we can rebuild 'offers' collection from the archive ('otomoto-reparse.py') instead of scraping Otomoto again
+# Each run of our scraper writes to its own 'otomoto-<date>-<time>.jsonl.gz' file, one JSON record per line
+# Each record is written as a separate gzip member, so a file is never rewritten and a crash can damage at most the last record
+import os # used for creating the archive directory and building paths
+import glob # used for finding all archive files
+import gzip # compression of our archive files
+import json # each archived page is stored as a JSON record
+import time # used for recording when a page was downloaded and for naming archive files
+import zlib # a damaged (cut off) record raises 'zlib.error' while reading
+
+
+# 'PageArchive' appends downloaded pages to a new archive file in 'directory'
+class PageArchive(object):
+
+    def __init__(self, directory):
+        if (not os.path.isdir(directory)):
+            os.makedirs(directory)
+        self.path = os.path.join(directory, 'otomoto-' + time.strftime('%Y%m%d-%H%M%S') + '.jsonl.gz')
+
+    # Appending a single 'response' of a list page ('kind' is 'list') or an offer's details page ('kind' is 'detail')
+    def add(self, kind, url, response):
+        record = {'kind': kind,
+                  'url': url,
+                  'fetched_at': time.time(),
+                  'status': response.status_code,
+                  'body': response.text}
+        with gzip.open(self.path, 'ab') as archive_file:
+            archive_file.write((json.dumps(record) + '\n').encode('utf-8'))
+
+    # Appending many responses of the same 'kind' at once
+    def add_all(self, kind, urls, responses):
+        for url, response in zip(urls, responses):
+            self.add(kind, url, response)
+
+
+# Returning paths of all archive files in 'directory', from the oldest to the newest
+def archive_files(directory):
+    return sorted(glob.glob(os.path.join(directory, 'otomoto-*.jsonl.gz')))
+
+
+# Reading all records from all archive files in 'directory', from the oldest to the newest
+# If the last record of a file was cut off (for example our scraper was killed while writing), we just skip it
+def read_archive(directory):
+    for path in archive_files(directory):
+        try:
+            with gzip.open(path, 'rb') as archive_file:
+                for line in archive_file:
+                    yield json.loads(line.decode('utf-8'))
+        except (EOFError, IOError, zlib.error, ValueError):
+            print('Skipping damaged end of ' + path)
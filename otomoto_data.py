@@ -0,0 +1,121 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Loading offers from our database for Machine Learning, used by '2-otomoto-ml.py'
+# Instead of pulling every field of every offer with 'list(offers.find())' (including long 'Opis' descriptions) and filling a huge DataFrame,
+# we ask MongoDB only for columns we use, we read offers in batches and we put their values straight into typed NumPy columns
+import time # used for measuring how long loading takes
+import sys # used for checking which system we are running on, to read memory usage correctly
+import numpy as np # typed columns of our data
+import pandas as pd # needed for creating data frames
+
+# 'resource' module is not available on Windows, in such case we just don't report memory usage
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Splitting collumns into three groups (I did split it manually, so all the values are visible):
+# 1. Categorical once that needs to be converted onto Integer (14 columns)
+columns_list_categorical = [u'Marka pojazdu', u'Model pojazdu', u'Kategoria', u'Kolor', u'Kraj pochodzenia', u'Napęd', u'Oferta od', u'Rodzaj paliwa', u'Skrzynia biegów', u'Stan', u'Typ', u'Wersja', u'Miasto', u'Wojewodztwo']
+# 2. The once that we want to use for our Machine Learning processes (95 columns)
+columns_list_to_be_used = [u'Akryl (niemetalizowany)', u'Bezwypadkowy', u'Emisja CO2', u'Faktura VAT', u'Filtr cząstek stałych', u'Leasing', u'Homologacja ciężarowa', u'Kierownica po prawej (Anglik)', u'Liczba drzwi', u'Liczba miejsc', u'Metalik', u'Matowy', u'Moc', u'Możliwość finansowania', u'Perłowy', u'Pierwszy właściciel', u'Pojemność skokowa', u'Przebieg', u'Rok produkcji', u'Serwisowany w ASO', u'Tuning', u'Uszkodzony', u'VAT marża', u'Wyposażenie: ABS', u'Wyposażenie: ASR (kontrola trakcji)', u'Wyposażenie: Alarm', u'Wyposażenie: Alufelgi', u'Wyposażenie: Isofix', u'Wyposażenie: Asystent parkowania', u'Wyposażenie: Asystent pasa ruchu', u'Wyposażenie: Bluetooth', u'Wyposażenie: MP3', u'Wyposażenie: CD', u'Wyposażenie: Centralny zamek', u'Wyposażenie: Czujnik deszczu', u'Wyposażenie: Hak', u'Wyposażenie: Czujnik martwego pola', u'Wyposażenie: Czujnik zmierzchu', u'Wyposażenie: Czujniki parkowania przednie', u'Wyposażenie: Czujniki parkowania tylne', u'Wyposażenie: Dach panoramiczny', u'Wyposażenie: ESP (stabilizacja toru jazdy)', u'Wyposażenie: Elektrochromatyczne lusterka boczne', u'Wyposażenie: Elektrochromatyczne lusterko wsteczne', u'Wyposażenie: Elektryczne szyby przednie', u'Wyposażenie: Elektryczne szyby tylne', u'Wyposażenie: Gniazdo USB', u'Wyposażenie: Elektrycznie ustawiane fotele', u'Wyposażenie: Elektrycznie ustawiane lusterka', u'Wyposażenie: Gniazdo AUX', u'Wyposażenie: Gniazdo SD', u'Wyposażenie: HUD (wyświetlacz przezierny)', u'Wyposażenie: Immobilizer', u'Wyposażenie: Kamera cofania', u'Wyposażenie: Klimatyzacja automatyczna', u'Wyposażenie: Klimatyzacja czterostrefowa', u'Wyposażenie: Klimatyzacja dwustrefowa', u'Wyposażenie: Klimatyzacja manualna', u'Wyposażenie: Komputer pokładowy', u'Wyposażenie: Kurtyny powietrzne', u'Wyposażenie: Nawigacja GPS', u'Wyposażenie: Odtwarzacz DVD', u'Zarejestrowany w Polsce', u'Wyposażenie: Ogranicznik prędkości', u'Wyposażenie: Ogrzewanie postojowe', u'Wyposażenie: Podgrzewana przednia szyba', u'Wyposażenie: Podgrzewane lusterka boczne', u'Wyposażenie: Podgrzewane przednie siedzenia', u'Wyposażenie: Radio fabryczne', u'Wyposażenie: Podgrzewane tylne siedzenia', u'Wyposażenie: Poduszka powietrzna chroniąca kolana', u'Wyposażenie: Tuner TV', u'Wyposażenie: Poduszka powietrzna kierowcy', u'Wyposażenie: Poduszka powietrzna pasażera', u'Wyposażenie: Przyciemniane szyby', u'Wyposażenie: Poduszki boczne przednie', u'Wyposażenie: Poduszki boczne tylne', u'Wyposażenie: Radio niefabryczne', u'Wyposażenie: Regulowane zawieszenie', u'Wyposażenie: Relingi dachowe', u'Wyposażenie: System Start-Stop', u'Wyposażenie: Szyberdach', u'Wyposażenie: Tapicerka skórzana', u'Wyposażenie: Tapicerka welurowa', u'Wyposażenie: Tempomat', u'Wyposażenie: Tempomat aktywny', u'Wyposażenie: Wielofunkcyjna kierownica', u'Wyposażenie: Wspomaganie kierownicy', u'Wyposażenie: Zmieniarka CD', u'Wyposażenie: Łopatki zmiany biegów', u'Wyposażenie: Światła LED', u'Wyposażenie: Światła Xenonowe', u'Wyposażenie: Światła do jazdy dziennej', u'Wyposażenie: Światła przeciwmgielne', u'Zarejestrowany jako zabytek']
+# 3. The once that we do not want to use for our Machine Learning processes (13 columns)
+# We won't use this variable actually, it's just for our record
+columns_list_not_to_be_used = [u'_id', u'Data publikacji', u'Liczba pozostałych rat', u'Miesięczna rata', u'Numer rejestracyjny pojazdu', u'VIN', u'Kod Silnika', u'Opis', u'Opłata początkowa', u'Otomoto id', u'Pierwsza rejestracja', u'Url', u'Wartość wykupu']
+
+# 'label' column - the one that we are going to predict
+label_column = u'Cena'
+
+# Columns from 'columns_list_to_be_used' which hold numbers, all the other ones are (0 or 1) columns, such as equipment
+# Numbers are stored as 'int32', (0 or 1) columns as 'uint8' - that's 4 and 1 bytes per value, instead of a Python object
+columns_list_numbers = [u'Emisja CO2', u'Liczba drzwi', u'Liczba miejsc', u'Moc', u'Pojemność skokowa', u'Przebieg', u'Rok produkcji']
+columns_list_flags = [column for column in columns_list_to_be_used if column not in columns_list_numbers]
+
+
+# Missing numbers are filled with zeros (0), same as 'fillna(0)' used to do
+# When importing data, it was thought out to structure data this way, so zeros here are desired values, not compromised
+def to_number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+# Some (0 or 1) columns contain few records with not only zero (0) and one (1) values, but a text, such as 'acrylic', 'matt' or 'metallic'
+# Any text means the flag is set, so we store it as one (1), missing values are stored as zero (0)
+def to_flag(value):
+    return 1 if value else 0
+
+
+# Categorical values are kept as text, missing ones as an empty text
+def to_category(value):
+    return value if value else u''
+
+
+# Converting a list of offers (dictionaries, such as documents from our database or 'db_record' from our scraper)
+# into a dictionary of typed NumPy columns
+def documents_to_columns(documents):
+    count = len(documents)
+    columns = {}
+    for column in columns_list_flags:
+        columns[column] = np.fromiter((to_flag(document.get(column, 0)) for document in documents), dtype=np.uint8, count=count)
+    for column in columns_list_numbers:
+        columns[column] = np.fromiter((to_number(document.get(column, 0)) for document in documents), dtype=np.int32, count=count)
+    for column in columns_list_categorical:
+        columns[column] = np.array([to_category(document.get(column)) for document in documents], dtype=object)
+    return columns
+
+
+# Converting a list of offers into a DataFrame with columns in the same order as we use them for Machine Learning
+def documents_to_frame(documents):
+    return pd.DataFrame(documents_to_columns(documents), columns=columns_list_to_be_used + columns_list_categorical)
+
+
+# Returning a mask of offers we keep aside for testing our models - every 'every'-th offer (10% by default)
+# Unlike a random split, the same offers stay aside when new offers are added at the end (for example to our snapshot),
+# so models trained now and models updated later are always compared on offers none of them was trained with
+def holdout_mask(count, every=10):
+    return np.arange(count) % every == 0
+
+
+# Returning the highest amount of memory (in MB) our process has used so far
+def peak_rss_mb():
+    if (resource is None):
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports it in kilobytes, Mac in bytes
+    return round(peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0, 1)
+
+
+# Loading all offers from our 'collection' into a DataFrame with all the columns we use, and the 'label' column
+# MongoDB sends us only the columns we ask for ('projection'), in batches of 'batch_size' offers
+# Each batch is converted into typed columns right away, so we never keep more than one batch of dictionaries in memory
+def load_offers(collection, query=None, batch_size=5000):
+    start = time.time()
+    projection = dict((column, 1) for column in columns_list_to_be_used + columns_list_categorical + [label_column])
+    projection['_id'] = 0
+    chunks = []
+    labels = []
+    batch = []
+    cursor = collection.find(query or {}, projection, batch_size=batch_size)
+    for document in cursor:
+        batch.append(document)
+        if (len(batch) >= batch_size):
+            chunks.append(documents_to_columns(batch))
+            labels.append(np.fromiter((to_number(document.get(label_column)) for document in batch), dtype=np.int64, count=len(batch)))
+            batch = []
+    if (batch or not chunks):
+        chunks.append(documents_to_columns(batch))
+        labels.append(np.fromiter((to_number(document.get(label_column)) for document in batch), dtype=np.int64, count=len(batch)))
+
+    # Putting all the batches together, column by column
+    columns = dict((column, np.concatenate([chunk[column] for chunk in chunks])) for column in chunks[0])
+    columns[label_column] = np.concatenate(labels)
+    df = pd.DataFrame(columns, columns=columns_list_to_be_used + columns_list_categorical + [label_column])
+
+    # Printing how many offers we loaded, how long it took and how much memory we needed
+    print('Loaded ' + str(len(df)) + ' offers in ' + str(round(time.time() - start, 2)) + 's, peak RSS: ' + str(peak_rss_mb()) + ' MB')
+    return df
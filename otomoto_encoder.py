@@ -0,0 +1,78 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Converting our categorical data (such as 'Marka pojazdu' or 'Kolor') into Integers, used by '2-otomoto-ml.py'
+# Each column has its own vocabulary - a list of known values, where value's code is its position in the list (starting from 1)
+# Vocabulary is saved to a file, so exactly the same codes are used when we predict prices and when we train our models again
+# New values are always added at the end of the vocabulary, so codes of values we already know never change
+# Values which are not in the vocabulary (for example a brand new model of a car) get a special 'unknown' code: zero (0)
+import os # used for creating a directory for our vocabulary file
+import json # vocabulary is saved as a JSON file
+import numpy as np # needed for Integer codes
+import pandas as pd # 'pd.Categorical' converts a whole column at once
+
+# Version of our vocabulary file format, it should be changed whenever the format changes
+VOCABULARY_FORMAT = 1
+# Code of values which are not in the vocabulary
+UNKNOWN = 0
+
+
+class CategoricalEncoder(object):
+
+    # 'columns' are names of categorical columns, 'vocabulary' maps each of them to a list of known values
+    # 'revision' is increased each time new values are added, so we know which vocabulary a model was trained with
+    def __init__(self, columns, vocabulary=None, revision=0):
+        self.columns = list(columns)
+        self.vocabulary = vocabulary or dict((column, []) for column in self.columns)
+        self.revision = revision
+
+    # Adding values we have not seen yet to the end of each column's vocabulary
+    # New values are sorted, so two runs over the same data always give the same codes
+    def fit(self, df):
+        changed = False
+        for column in self.columns:
+            known = set(self.vocabulary[column])
+            new_values = sorted(value for value in pd.unique(df[column]) if value not in known)
+            if (new_values):
+                self.vocabulary[column].extend(new_values)
+                changed = True
+        if (changed):
+            self.revision += 1
+        return self
+
+    # Converting categorical columns of 'df' into Integer codes, in a single pass per column
+    # Other columns are left as they are and 'df' itself is not changed
+    def transform(self, df):
+        encoded = df.copy(deep=False)
+        for column in self.columns:
+            # 'pd.Categorical' gives us positions of values in the vocabulary, and -1 for unknown values
+            # Adding one (1) moves unknown values to zero (0) and known values to codes starting from one (1)
+            codes = pd.Categorical(df[column], categories=self.vocabulary[column]).codes
+            encoded[column] = codes.astype(np.int32) + 1
+        return encoded
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    # Saving our vocabulary to a JSON file
+    # It's written to a temporary file first, so a crash never leaves us with half of a vocabulary
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if (directory and not os.path.isdir(directory)):
+            os.makedirs(directory)
+        with open(path + '.tmp', 'w') as vocabulary_file:
+            json.dump({'format': VOCABULARY_FORMAT,
+                       'revision': self.revision,
+                       'columns': self.columns,
+                       'vocabulary': self.vocabulary}, vocabulary_file)
+        os.rename(path + '.tmp', path)
+
+    # Loading a vocabulary saved with 'save'
+    @classmethod
+    def load(cls, path):
+        with open(path) as vocabulary_file:
+            saved = json.load(vocabulary_file)
+        if (saved['format'] != VOCABULARY_FORMAT):
+            raise ValueError('Unsupported vocabulary format ' + str(saved['format']) + ' in ' + path)
+        return cls(saved['columns'], saved['vocabulary'], saved['revision'])
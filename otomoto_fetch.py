@@ -0,0 +1,221 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Helpers used by '1-otomoto-scraping.py' for downloading pages from Otomoto concurrently
+# Instead of one blocking 'requests.get' followed by 'time.sleep(0.5)' we keep a small pool of worker threads
+# which share one 'requests.Session' (so TCP connections are kept alive and reused)
+# and one token bucket, which decides how many requests per second we are allowed to send to Otomoto server
+# A slow response or a reset connection does not stop our scraper anymore:
+# - each request has a timeout and it's retried a few times, waiting longer and longer (exponential backoff with jitter) between attempts
+# - when Otomoto answers with 429 (Too Many Requests) or 5xx, our token bucket slows down, and it speeds up again while requests succeed
+# - a page which still fails after all attempts gives us a 'FetchError', so the caller can put it aside (for example to a dead-letter queue)
+import time # used for measuring time between requests in our token bucket
+import random # used for adding jitter to our backoff, so our workers don't retry all at the same moment
+import threading # token bucket is shared between worker threads, so it needs a lock
+from multiprocessing.pool import ThreadPool # pool of threads, it's available in both Python 2 and Python 3
+import requests # will be used for making http requests from our scraper
+from requests.adapters import HTTPAdapter # lets us set the size of the keep-alive connection pool
+
+# 'urlparse' module was moved to 'urllib.parse' in Python 3
+try:
+    from urllib.parse import urlsplit, urlunsplit
+except ImportError:
+    from urlparse import urlsplit, urlunsplit
+
+# HTTP statuses after which a request is retried: 429 means we are too fast, 5xx means Otomoto server has a problem
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# HTTP statuses after which our token bucket slows down: besides 429 and 503, a proxy or load balancer in front of Otomoto
+# answers 502 and 504 when servers behind it are overloaded, so we treat them as a sign of being too fast as well
+# 500 is left out, it usually means an error on a single page rather than too much load
+SLOW_DOWN_STATUSES = (429, 502, 503, 504)
+
+
+# Raised when a page could not be downloaded, even after all the attempts
+class FetchError(Exception):
+
+    def __init__(self, url, reason):
+        Exception.__init__(self, url, reason)
+        self.url = url
+        self.reason = reason
+
+    def __str__(self):
+        return 'Could not fetch ' + self.url + ': ' + self.reason
+
+
+# Replacing scheme and host of 'url' with the ones of 'host', for example:
+# rewrite_host('https://www.otomoto.pl/oferta/audi.html', 'http://127.0.0.1:8080') -> 'http://127.0.0.1:8080/oferta/audi.html'
+def rewrite_host(url, host):
+    scheme, netloc = urlsplit(host)[:2]
+    return urlunsplit((scheme, netloc) + tuple(urlsplit(url)[2:]))
+
+
+# Creating a 'requests.Session' which keeps connections to Otomoto open between requests
+# By default 'requests' keeps only 10 connections per host, so we resize the pool to the number of our workers
+def make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Token bucket rate limiter, it replaces fixed 'time.sleep(0.5)' which we had after each offer
+# Bucket is refilled with 'rate' tokens per second and holds at most 'capacity' tokens,
+# each request takes one token - if there are none left, the caller waits until a new one drips in
+# That way no matter how many workers we run, Otomoto server never sees more than 'rate' requests per second on average
+# The rate adapts to how Otomoto server copes with our requests (additive increase, multiplicative decrease):
+# - 'slow_down' halves it (but never below 'min_rate'), at most once per 'cooldown' seconds, since all our workers usually get 429 at once
+# - 'speed_up' adds a small step after each successful request, until we are back at the 'rate' we started with
+# - 'pause' stops all the workers for a while, for example for as long as 'Retry-After' header tells us
+class TokenBucket(object):
+
+    def __init__(self, rate, capacity=1, min_rate=0.1, cooldown=1.0):
+        self.rate = float(rate)
+        self.max_rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.cooldown = cooldown
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.time()
+        self.paused_until = 0
+        self.slowed_down = 0
+        self.lock = threading.Lock()
+
+    def slow_down(self, factor=0.5):
+        with self.lock:
+            now = time.time()
+            if (now - self.slowed_down < self.cooldown):
+                return False
+            self.slowed_down = now
+            self.rate = max(self.min_rate, self.rate * factor)
+            return True
+
+    def speed_up(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                if (now < self.paused_until):
+                    # While paused, all the workers wait until the pause is over, and then they start with an empty bucket
+                    self.tokens = 0
+                    self.updated = self.paused_until
+                    wait = self.paused_until - now
+                else:
+                    # Adding tokens that dripped in since the last call, but never more than the bucket can hold
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if (self.tokens >= 1):
+                        self.tokens -= 1
+                        return
+                    # Not enough tokens, calculating how long we need to wait for the next one
+                    wait = (1 - self.tokens) / self.rate
+            # Sleeping outside of the lock, so other workers are not blocked while we wait
+            time.sleep(wait)
+
+
+# Reading 'Retry-After' header of a response, returns the amount of seconds we are asked to wait or None
+# The header can be also given as a date, in such case we just use our own backoff
+def retry_after(response):
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return None
+
+
+# 'Fetcher' puts all of the above together: shared session, shared rate limiter and a pool of worker threads
+# 'concurrency' is the number of detail pages downloaded at the same time
+# 'requests_per_second' is the overall limit of requests sent to Otomoto server
+# 'timeout' is a tuple of seconds we wait for a connection and for a response, without it a stuck request would block a worker forever
+# 'retries' is the amount of times a failed request is repeated, 'backoff' is the wait before the first repeat (in seconds),
+# it doubles with each next attempt, but it's never longer than 'max_backoff'
+# 'metrics' (optional, 'otomoto_metrics.Metrics') gets timings of our requests, counts of HTTP statuses, retries and failures
+# 'host' (optional, such as 'http://127.0.0.1:8080') replaces scheme and host of every url we download, list pages and offers alike,
+# so we can run against our local stand-in server ('otomoto-local-server.py') without sending a single request to Otomoto
+class Fetcher(object):
+
+    def __init__(self, concurrency=8, requests_per_second=4, burst=1, metrics=None,
+                 timeout=(5, 30), retries=4, backoff=1.0, max_backoff=60, host=None):
+        self.session = make_session(concurrency)
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self.pool = ThreadPool(concurrency)
+        self.metrics = metrics
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.host = host
+
+    def increment(self, name, **labels):
+        if (self.metrics is not None):
+            self.metrics.increment(name, **labels)
+
+    # How long we wait before attempt number 'attempt' + 1 - a random time up to the exponential backoff ('full jitter')
+    def backoff_seconds(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    # A single attempt of downloading a page, waiting for the rate limiter first
+    # 'stage' is the name under which the request is timed, time spent waiting for the rate limiter is not included
+    def attempt(self, url, stage):
+        if (self.host):
+            url = rewrite_host(url, self.host)
+        self.rate_limiter.acquire()
+        if (self.metrics is None):
+            return self.session.get(url, timeout=self.timeout)
+        with self.metrics.timer(stage):
+            response = self.session.get(url, timeout=self.timeout)
+        self.metrics.increment('http_responses', status=response.status_code)
+        return response
+
+    # Downloading a single page, repeating the request if it fails with a timeout, a connection error, 429 or 5xx
+    # Any other response (also 404) is returned as it is, if all the attempts fail, 'FetchError' is raised
+    def get(self, url, stage='detail_fetch'):
+        for attempt in range(self.retries + 1):
+            wait = None
+            try:
+                response = self.attempt(url, stage)
+            except requests.RequestException as error:
+                reason = type(error).__name__
+            else:
+                if (response.status_code not in RETRY_STATUSES):
+                    self.rate_limiter.speed_up()
+                    return response
+                reason = 'HTTP ' + str(response.status_code)
+                if (response.status_code in SLOW_DOWN_STATUSES):
+                    # Otomoto tells us we are too fast (or is overloaded), so all our workers slow down and wait as long as we are asked to,
+                    # but never longer than 'max_backoff' - a header such as 'Retry-After: 3600' would stop our whole crawl for an hour
+                    if (self.rate_limiter.slow_down()):
+                        self.increment('rate_slow_downs')
+                    wait = retry_after(response)
+                    if (wait is not None):
+                        wait = min(wait, self.max_backoff)
+                        self.rate_limiter.pause(wait)
+            if (attempt < self.retries):
+                self.increment('retries', stage=stage, reason=reason)
+                time.sleep(wait if wait is not None else self.backoff_seconds(attempt))
+        self.increment('fetch_failures', stage=stage, reason=reason)
+        raise FetchError(url, reason)
+
+    # Returning the response of a page, or 'FetchError' if it could not be downloaded, used for downloading many pages at once
+    def get_or_error(self, url):
+        try:
+            return self.get(url)
+        except FetchError as error:
+            return error
+
+    # Downloading many pages at once, responses are returned in the same order as 'urls'
+    # A page which could not be downloaded does not stop the others, 'FetchError' is returned in its place
+    def get_all(self, urls):
+        return self.pool.map(self.get_or_error, urls)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.session.close()
@@ -0,0 +1,69 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Local stand-in for Otomoto server, it serves pages recorded in our archive (saved by '1-otomoto-scraping.py' with 'OTOMOTO_ARCHIVE')
+# Pages are found by their path and query only, so a recorded 'https://www.otomoto.pl/oferta/audi.html'
+# is served as 'http://127.0.0.1:8080/oferta/audi.html' - with 'OTOMOTO_HOST' pointing here, our scraper runs without touching Otomoto
+# Pages which were not recorded get '404 Not Found', so our scraper stops at the first list page we don't have
+import otomoto_archive # our own archive of downloaded pages
+
+# 'urlparse' module was moved to 'urllib.parse' in Python 3
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+# HTTP server modules were renamed in Python 3
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+# Path and query of 'url', the same way our server sees them in a request
+def page_key(url):
+    parts = urlsplit(url)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+
+# Reading all pages from the archive in 'directory', returns a dictionary of (status, body) by their 'page_key'
+# If a page was recorded many times, its newest version is served
+def load_recorded_pages(directory):
+    pages = {}
+    for record in otomoto_archive.read_archive(directory):
+        pages[page_key(record['url'])] = (record['status'], record['body'])
+    return pages
+
+
+class RecordedPageHandler(BaseHTTPRequestHandler):
+
+    # Dictionary of (status, body) by 'page_key', it's set by 'make_server'
+    pages = {}
+
+    def do_GET(self):
+        status, body = self.pages.get(self.path, (404, u'<html><body>Not recorded</body></html>'))
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Not printing a line for every request
+    def log_message(self, *args):
+        pass
+
+
+# Each request is handled in its own thread, so our fetcher's workers don't wait for each other
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+# Creating a server for 'pages' (returned by 'load_recorded_pages') listening on 'port' (0 means any free port)
+# It's started with 'serve_forever', its address can be read from 'server_address'
+def make_server(pages, port=8080, host='127.0.0.1'):
+    handler = type('Handler', (RecordedPageHandler,), {'pages': pages})
+    return ThreadingHTTPServer((host, port), handler)
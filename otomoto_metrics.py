@@ -0,0 +1,127 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Measuring where our scraper spends its time, used by '1-otomoto-scraping.py'
+# Instead of printing every field of every offer, we collect:
+# - timers of each stage (list fetch, detail fetch, parse, dedup, DB write) - their counts, sums and histograms
+# - counters, such as saved offers, HTTP statuses, retries or parse failures by field
+# From time to time a short summary is printed, and everything can be saved in Prometheus text format
+import os # used for replacing our metrics file at once
+import time # used for measuring time of each stage
+import threading # metrics are updated from our fetcher's worker threads, so they need a lock
+from contextlib import contextmanager # lets us measure a stage with a simple 'with' statement
+
+# Text type is called 'unicode' in Python 2 and 'str' in Python 3
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+# Upper bounds (in seconds) of histogram buckets, the last one catches everything
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf')]
+
+
+# Label values can be numbers (such as HTTP status) or text (such as a field name with Polish letters)
+def to_label(value):
+    return value if isinstance(value, text_type) else str(value)
+
+
+class Metrics(object):
+
+    def __init__(self, prefix='otomoto_scraper'):
+        self.prefix = prefix
+        self.started = time.time()
+        self.last_report = self.started
+        self.lock = threading.Lock()
+        # Counters are kept by their name and labels, for example ('http_responses', (('status', '200'),))
+        self.counters = {}
+        # Each stage has its count, sum of seconds and counts of its histogram buckets
+        self.stages = {}
+
+    # Increasing counter 'name' with given 'labels', for example: metrics.increment('http_responses', status=200)
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted((label, to_label(value)) for label, value in labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def counter(self, name, **labels):
+        return self.counters.get((name, tuple(sorted((label, to_label(value)) for label, value in labels.items()))), 0)
+
+    # Recording that 'stage' took 'seconds'
+    def observe(self, stage, seconds):
+        with self.lock:
+            if (stage not in self.stages):
+                self.stages[stage] = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(BUCKETS)}
+            metric = self.stages[stage]
+            metric['count'] += 1
+            metric['sum'] += seconds
+            for index, bound in enumerate(BUCKETS):
+                if (seconds <= bound):
+                    metric['buckets'][index] += 1
+                    break
+
+    # Measuring a stage: 'with metrics.timer('parse'): ...'
+    @contextmanager
+    def timer(self, stage):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.time() - start)
+
+    # Saved offers per second since we started
+    def offers_per_second(self):
+        return self.counter('offers_saved') / max(time.time() - self.started, 1e-9)
+
+    # A short, one line summary of everything we measured so far
+    def summary(self):
+        with self.lock:
+            stages = sorted(self.stages.items())
+            counters = sorted(self.counters.items())
+        parts = ['offers: ' + str(self.counter('offers_saved')) + ' (' + str(round(self.offers_per_second(), 2)) + '/s)']
+        for stage, metric in stages:
+            parts.append(stage + ': ' + str(metric['count']) + 'x avg ' + str(round(metric['sum'] / metric['count'], 3)) + 's')
+        for (name, labels), value in counters:
+            if (name != 'offers_saved'):
+                parts.append(name + ('{' + ','.join(label + '=' + label_value for label, label_value in labels) + '}' if labels else '') + ': ' + str(value))
+        return ' | '.join(parts)
+
+    # Printing our summary, but not more often than every 'interval' seconds
+    def maybe_report(self, interval):
+        if (time.time() - self.last_report >= interval):
+            self.last_report = time.time()
+            print(self.summary())
+            return True
+        return False
+
+    # Everything we measured in Prometheus text format, for example to be picked up by 'node_exporter' textfile collector
+    def prometheus_text(self):
+        with self.lock:
+            stages = sorted(self.stages.items())
+            counters = sorted(self.counters.items())
+        lines = []
+        name = self.prefix + '_stage_seconds'
+        lines.append('# TYPE ' + name + ' histogram')
+        for stage, metric in stages:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, metric['buckets']):
+                cumulative += count
+                lines.append(name + '_bucket{stage="' + stage + '",le="' + ('+Inf' if bound == float('inf') else repr(bound)) + '"} ' + str(cumulative))
+            lines.append(name + '_sum{stage="' + stage + '"} ' + repr(metric['sum']))
+            lines.append(name + '_count{stage="' + stage + '"} ' + str(metric['count']))
+        for counter_name in sorted(set(counter_name for (counter_name, labels), value in counters)):
+            lines.append('# TYPE ' + self.prefix + '_' + counter_name + '_total counter')
+            for (other_name, labels), value in counters:
+                if (other_name == counter_name):
+                    label_text = ','.join(label + '="' + label_value.replace('"', '\\"') + '"' for label, label_value in labels)
+                    lines.append(self.prefix + '_' + counter_name + '_total' + ('{' + label_text + '}' if label_text else '') + ' ' + str(value))
+        lines.append('# TYPE ' + self.prefix + '_offers_per_second gauge')
+        lines.append(self.prefix + '_offers_per_second ' + repr(self.offers_per_second()))
+        return '\n'.join(lines) + '\n'
+
+    # Saving our metrics in Prometheus text format to 'path', through a temporary file so it's never read half written
+    def dump(self, path):
+        with open(path + '.tmp', 'wb') as metrics_file:
+            metrics_file.write(self.prometheus_text().encode('utf-8'))
+        os.rename(path + '.tmp', path)
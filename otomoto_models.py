@@ -0,0 +1,178 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Machine Learning models we compare in '2-otomoto-ml.py', together with a benchmark which runs them
+# For each model we record not only its score, but also how long it takes to train it, how fast it predicts and how big it is,
+# so we can pick a model looking at both its accuracy and its cost
+# Results are saved to a JSON report, so they can be compared between runs
+import os # used for creating a directory for our report
+import json # our report is saved as a JSON file
+import time # used for measuring how long training and predicting takes
+import pickle # used for measuring how big a trained model is
+import numpy as np # needed for the calculations of our streaming Linear Regression
+from joblib import Parallel, delayed # runs our models in a pool of processes, it's installed together with 'scikit-learn'
+from sklearn.base import BaseEstimator, RegressorMixin # base classes of all 'scikit-learn' models, they give us 'score' and 'clone' support
+from sklearn.base import clone # creates a fresh, not trained copy of a model
+from sklearn.metrics import r2_score # the same score as 'model.score' gives us for regression models
+from sklearn.linear_model import LinearRegression # importing Linear Regression model
+from sklearn.tree import DecisionTreeRegressor # importing Decision Tree Regressor model
+from sklearn.neural_network import MLPRegressor # importing MLPRegressor model
+from sklearn.ensemble import RandomForestRegressor # importing RandomForestRegressor model
+from sklearn.ensemble import ExtraTreesRegressor # importing ExtraTreesRegressor model
+from sklearn.ensemble import GradientBoostingRegressor # importing GradientBoostingRegressor model
+from sklearn.ensemble import BaggingRegressor # importing BaggingRegressor model
+
+
+# Linear Regression which can be trained in steps, used for our saved 'linear_regression' model instead of 'LinearRegression' from 'scikit-learn'
+# It gives the same results (least squares with an intercept), but it only keeps a few small sums:
+# the amount of offers ('n_samples_seen_'), means of each column ('x_mean_', 'y_mean_') and cross-products of columns
+# around their means ('xtx_' - X transposed times X, 'xty_' - X transposed times y)
+# New offers are just added to these sums with 'partial_fit', so the model can be updated without looking at old offers again
+# Our columns have very different scales (mileage up to a million next to 0 / 1 flags), so before solving,
+# each column is scaled by its standard deviation - without it, real directions of our data get lost in rounding errors
+class StreamingLinearRegression(RegressorMixin, BaseEstimator):
+
+    def fit(self, x, y):
+        for attribute in ['xtx_', 'xty_', 'x_mean_', 'y_mean_', 'n_samples_seen_']:
+            if (hasattr(self, attribute)):
+                delattr(self, attribute)
+        return self.partial_fit(x, y)
+
+    def partial_fit(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        count = len(x)
+        x_mean = x.mean(axis=0)
+        y_mean = y.mean()
+        x_centred = x - x_mean
+        xtx = x_centred.T.dot(x_centred)
+        xty = x_centred.T.dot(y - y_mean)
+        if (not hasattr(self, 'xtx_')):
+            self.xtx_, self.xty_, self.x_mean_, self.y_mean_, self.n_samples_seen_ = xtx, xty, x_mean, y_mean, count
+        else:
+            # Merging sums of new offers with the ones we already have, each of them kept around its own means
+            total = self.n_samples_seen_ + count
+            x_delta = x_mean - self.x_mean_
+            y_delta = y_mean - self.y_mean_
+            weight = float(self.n_samples_seen_) * count / total
+            self.xtx_ = self.xtx_ + xtx + weight * np.outer(x_delta, x_delta)
+            self.xty_ = self.xty_ + xty + weight * x_delta * y_delta
+            self.x_mean_ = self.x_mean_ + x_delta * count / total
+            self.y_mean_ = self.y_mean_ + y_delta * count / total
+            self.n_samples_seen_ = total
+        # Columns which never change (such as equipment nobody has in our data) get no weight at all
+        scale = np.sqrt(np.diag(self.xtx_))
+        used = scale > 0
+        scaled = self.xtx_[used][:, used] / np.outer(scale[used], scale[used])
+        solution = np.linalg.lstsq(scaled, self.xty_[used] / scale[used], rcond=None)[0]
+        self.coef_ = np.zeros(x.shape[1])
+        self.coef_[used] = solution / scale[used]
+        self.intercept_ = self.y_mean_ - self.x_mean_.dot(self.coef_)
+        return self
+
+    def predict(self, x):
+        return np.asarray(x, dtype=np.float64).dot(self.coef_) + self.intercept_
+
+
+# All the models we compare, each one with its name, in the order they are run and reported
+# Scores in comments are the ones we got when we trained them one after another for the first time
+model_registry = [
+    ('linear_regression', LinearRegression()), # -> 0.6552409768836058
+    ('mlp_regressor', MLPRegressor()), # -> 0.8113884821105333
+    ('decision_tree_regressor', DecisionTreeRegressor()), # -> 0.8642185163401331
+    ('gradient_boosting_regressor', GradientBoostingRegressor()), # -> 0.8978408816999488
+    ('extra_trees_regressor', ExtraTreesRegressor()), # -> 0.9071302394368891
+    ('bagging_regressor', BaggingRegressor()), # -> 0.9154010467830169
+    ('random_forest_regressor', RandomForestRegressor()), # -> 0.920122663462127
+    ('random_forest_regressor_depth_5', RandomForestRegressor(max_depth=5, random_state=0, n_estimators=100)), # -> 0.8134829521876554
+    ('random_forest_regressor_depth_200', RandomForestRegressor(max_depth=200, random_state=100, n_estimators=50)), # -> 0.9329107755184214
+]
+
+# Models we save are the same as in our benchmark, except for those listed here - they are saved as a model of another class,
+# which gives the same results, but can be updated with new offers by 'otomoto-retrain.py'
+saved_model_registry = {
+    'linear_regression': StreamingLinearRegression(),
+}
+
+
+# Returning a fresh, not trained copy of the model we save under 'name'
+def saved_model(name):
+    return clone(saved_model_registry.get(name, dict(model_registry)[name]))
+
+
+# 'latency_repeats' variable takes the amount of times we predict a single offer, the fastest one is reported
+latency_repeats = 20
+
+
+# Training a single model and measuring it, returns a dictionary with all the results,
+# together with the trained model if we want to 'keep' it (otherwise None, so it's not sent back from its process for nothing)
+def benchmark_model(name, model, x_train, y_train, x_test, y_test, keep=False):
+    start = time.time()
+    model.fit(x_train, y_train)
+    fit_time = time.time() - start
+
+    # Predicting all the test offers at once, this is how our model would be used for many offers
+    start = time.time()
+    predictions = model.predict(x_test)
+    predict_time = time.time() - start
+
+    # Predicting a single offer, this is how our model would be used for one offer at a time
+    single_offer = x_test[:1]
+    single_offer_times = []
+    for _ in range(latency_repeats):
+        start = time.time()
+        model.predict(single_offer)
+        single_offer_times.append(time.time() - start)
+
+    result = {'name': name,
+              'model': repr(model),
+              'score': r2_score(y_test, predictions),
+              'fit_seconds': fit_time,
+              'predict_seconds_per_row': predict_time / len(x_test),
+              'predict_seconds_single_row': min(single_offer_times),
+              'size_bytes': len(pickle.dumps(model, pickle.HIGHEST_PROTOCOL))}
+    return result, (model if keep else None)
+
+
+# Running all the models from 'registry' and saving results to 'report_path'
+# 'workers' decides how we use our cores:
+# - with more than one worker, models are trained at the same time, each one in its own process
+# - with one worker, models are trained one after another, but those which can use many cores ('n_jobs') use all of them
+# Models named in 'keep' are returned trained, so they can be saved without training them again
+# Returns a list of results and a dictionary of kept models by their names
+def run_benchmark(registry, x_train, y_train, x_test, y_test, report_path, workers=-1, keep=()):
+    models = []
+    for name, model in registry:
+        model = clone(model)
+        if (workers == 1 and 'n_jobs' in model.get_params()):
+            model.set_params(n_jobs=-1)
+        models.append((name, model))
+
+    start = time.time()
+    outcomes = Parallel(n_jobs=workers)(delayed(benchmark_model)(name, model, x_train, y_train, x_test, y_test, name in keep) for name, model in models)
+    elapsed = time.time() - start
+    results = [result for result, model in outcomes]
+    kept = {}
+    for result, model in outcomes:
+        if (model is not None):
+            # Kept models get back their own 'n_jobs', so a saved model does not use all the cores for predicting a single offer
+            if ('n_jobs' in model.get_params()):
+                model.set_params(n_jobs=dict(registry)[result['name']].get_params()['n_jobs'])
+            kept[result['name']] = model
+
+    for result in results:
+        print(result['name'] + ' score: ' + str(result['score']) + ', fit: ' + str(round(result['fit_seconds'], 2)) + 's, size: ' + str(result['size_bytes'] // 1024) + ' KB')
+    print('All models trained in ' + str(round(elapsed, 2)) + 's')
+
+    directory = os.path.dirname(report_path)
+    if (directory and not os.path.isdir(directory)):
+        os.makedirs(directory)
+    with open(report_path, 'w') as report_file:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'train_rows': len(x_train),
+                   'test_rows': len(x_test),
+                   'workers': workers,
+                   'total_seconds': elapsed,
+                   'results': results}, report_file, indent=2)
+    return results, kept
@@ -0,0 +1,220 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Parsing of Otomoto pages used by '1-otomoto-scraping.py'
+# Instead of building a full 'html.parser' tree and going through a long 'if / elif' chain for each item,
+# we use a faster 'lxml' backend (if it's installed), we build only those parts of an offer's details page we really need,
+# and we convert each item with a converter looked up in a simple table ('FIELDS')
+# Parsing does not need any network, so it can be done in a pool of processes, separately from downloading
+# A page which does not look like we expect (for example without the metabar) gives us a 'ParseError' instead of stopping our scraper
+import re # regular expressions, used for removing all kinds of white spaces from numbers
+import time # used for measuring how long parsing of each page takes
+import multiprocessing # pool of processes, so parsing can use all the cores we have
+from bs4 import BeautifulSoup # html parser package
+from bs4 import SoupStrainer # lets 'BeautifulSoup' build only selected parts of a page
+
+# 'lxml' is much faster than Python's built in 'html.parser', but it needs to be installed with 'pip install lxml'
+# If it's not installed, we just fall back to 'html.parser'
+try:
+    import lxml # noqa: F401 (imported only to check if it's available)
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+# On offer's details page we are interested only in four blocks: 'date' and 'otomoto id' (metabar), basic information items,
+# features and description - everything else (photos, similar offers, scripts and so on) is skipped while parsing
+DETAIL_BLOCKS = SoupStrainer(class_=['offer-content__rwd-metabar', 'offer-params__item', 'offer-features', 'offer-description'])
+
+# Matches any white spaces, including new lines, which we need to remove from numbers such as '150 000'
+WHITESPACE = re.compile(r'\s+', re.UNICODE)
+
+
+# Raised when an offer's details page is missing a block we can't do without, such as its 'otomoto id'
+class ParseError(ValueError):
+    pass
+
+
+# Converters used in our 'FIELDS' table, each of them takes already stripped text of an item's value
+
+# Items that has 'values' as 'Yes' ('Tak' in polish) we want to convert right away and store in our database as just 1 (one)
+def yes_to_one(text):
+    return 1 if text == u'Tak' else text
+
+
+# Items which are numbers followed by a unit, such as '150 000 km', are stored as Integers without the unit and spaces
+def int_without(unit):
+    return lambda text: int(WHITESPACE.sub(u'', text.replace(unit, u'')))
+
+
+# Any other items are stored as they are
+def as_text(text):
+    return text
+
+
+# 'FIELDS' table maps each basic information item 'key' to a converter of its value
+# Some items on offer details page are clickable (links) - all of these can have 'Tak' value, so they are converted with 'yes_to_one'
+FIELDS = dict((key, yes_to_one) for key in [
+    u'Oferta od', u'Kategoria', u'Marka pojazdu', u'Model pojazdu', u'Rodzaj paliwa', u'Napęd', u'Typ', u'Kolor',
+    u'Metalik', u'Perłowy', u'VAT marża', u'Kraj pochodzenia', u'Pierwszy właściciel', u'Serwisowany w ASO', u'Stan',
+    u'Wersja', u'Skrzynia biegów', u'Bezwypadkowy', u'Akryl (niemetalizowany)', u'Faktura VAT', u'Zarejestrowany w Polsce',
+    u'Używane', u'Filtr cząstek stałych', u'Kod Silnika', u'Możliwość finansowania', u'Leasing', u'Uszkodzony', u'Tuning',
+    u'Matowy', u'Homologacja ciężarowa', u'Zarejestrowany jako zabytek', u'Kierownica po prawej (Anglik)'])
+FIELDS.update({
+    u'Przebieg': int_without(u'km'),
+    u'Pojemność skokowa': int_without(u'cm3'),
+    u'Moc': int_without(u'KM'),
+    u'Emisja CO2': int_without(u'g/km'),
+    # Some item are out of the box ready to be converted to Integers
+    u'Liczba drzwi': int,
+    u'Liczba miejsc': int,
+    u'Rok produkcji': int,
+})
+
+
+# Converting a price, such as '32 900 PLN' or '7 500,50 EUR', to an Integer in PLN
+def parse_price(text):
+    # Removing 'PLN' substring, spaces and new lines
+    price = WHITESPACE.sub(u'', text).replace(u'PLN', u'')
+    # Not often, but some prices are given in other currencies that PLN, in such case we calculate PLN
+    if (u'EUR' in price):
+        return int(float(price.replace(u'EUR', u'').replace(u',', u'.')) * 4.27)
+    elif (u'USD' in price):
+        return int(float(price.replace(u'USD', u'').replace(u',', u'.')) * 3.74)
+    return int(float(price.replace(u',', u'.')))
+
+
+# Parsing a list page, for each of its offers we return a dictionary with:
+# - 'id' - offer's id taken from 'data-ad-id' attribute of its 'article' element (or None if it's not there)
+# - 'url' - an url which will lead us to the offer's details page
+# - 'Cena', 'Miasto' and 'Wojewodztwo' - price and location, which are easier to take from the list page than from details page
+# An offer which can't be parsed (for example without a price) is skipped, and the reason is added to 'failures' list (if given)
+def parse_list_page(html, parser=PARSER, failures=None):
+    soup = BeautifulSoup(html, parser)
+    items = []
+    for content in soup.find_all('div', class_='offer-item__content'):
+        try:
+            # Since the location format is as followed: 'Warszawa (Mazowieckie)' - the best way is to just split by '('
+            location = content.find('span', class_='offer-item__location').h4.text.split(u'(')
+            items.append({
+                'id': (content.find_parent('article') or {}).get('data-ad-id'),
+                'url': content.find('a', class_='offer-title__link').get('href'),
+                'Cena': parse_price(content.find('span', class_='offer-price__number').text),
+                'Miasto': location[0].strip(),
+                'Wojewodztwo': location[1].replace(u')', u'').strip(),
+            })
+        except (AttributeError, IndexError, ValueError) as error:
+            if (failures is not None):
+                failures.append(type(error).__name__ + ': ' + str(error))
+    return items
+
+
+# Parsing offer's details page into a dictionary ready to be saved in our database (without price, location and url)
+# 'parser' and 'parse_only' can be changed, for example to compare our parsing with the full 'html.parser' tree in a benchmark
+# If an item can't be converted (for example a number with an unexpected unit), its text is kept as it is
+# and its 'key' is added to 'failures' list (if given), so we can count which items fail most often
+def parse_offer(html, parser=PARSER, parse_only=DETAIL_BLOCKS, failures=None):
+    soup = BeautifulSoup(html, parser, parse_only=parse_only)
+    offer = {}
+
+    # There are only two 'offer-meta__value' elements in the metabar: 'date' and 'otomoto id'
+    # Without them we can't tell which offer it is, so such a page can't be saved
+    metabar = soup.find('div', class_='offer-content__rwd-metabar')
+    date_and_id = metabar.find_all('span', class_='offer-meta__value') if metabar is not None else []
+    if (len(date_and_id) < 2):
+        raise ParseError('missing metabar')
+    offer[u'Data publikacji'] = date_and_id[0].get_text().strip()
+    offer[u'Otomoto id'] = date_and_id[1].get_text().strip()
+
+    # Basic information items, such as Year, Make, Model and so on, each of them is converted using our 'FIELDS' table
+    for item in soup.find_all('li', class_='offer-params__item'):
+        # Items without a name or a value are skipped
+        if (item.span is None or item.div is None):
+            continue
+        key = item.span.get_text().strip()
+        # Clickable items keep their value in a link, the others directly in 'div'
+        value = (item.div.a or item.div).get_text().strip()
+        try:
+            offer[key] = FIELDS.get(key, as_text)(value)
+        except ValueError:
+            offer[key] = value
+            if (failures is not None):
+                failures.append(key)
+
+    # Features are what a car is equipped with, 'Wyposażenie: ' prefix helps us to distinguish them from basic items
+    features = soup.find('div', class_='offer-features')
+    if (features is not None):
+        for feature in features.find_all('li', class_='offer-features__item'):
+            offer[u'Wyposażenie: ' + feature.get_text().strip()] = 1
+
+    # Last but not least, full description
+    description = soup.find('div', class_='offer-description')
+    if (description is None or description.div is None):
+        raise ParseError('missing description')
+    offer[u'Opis'] = description.div.get_text().strip()
+    return offer
+
+
+# Parsing offer's details page in our 'ParserPool', returns the offer, keys of items which failed to convert and how long it took
+# If the page can't be parsed at all, 'ParseError' is returned in place of the offer, so one broken page does not stop the others
+def parse_offer_measured(html):
+    start = time.time()
+    failures = []
+    try:
+        offer = parse_offer(html, failures=failures)
+    except ParseError as error:
+        offer = error
+    except Exception as error:
+        offer = ParseError(type(error).__name__ + ': ' + str(error))
+    return offer, failures, time.time() - start
+
+
+# Putting together data taken from a list page ('item') and from offer's details page ('offer') into our 'db_record'
+def build_record(item, offer):
+    db_record = dict(offer)
+    db_record.update({u'Cena': item['Cena'],
+                      u'Miasto': item['Miasto'],
+                      u'Wojewodztwo': item['Wojewodztwo'],
+                      u'Url': item['url']})
+    return db_record
+
+
+# Creating a pool of processes in 'fork' mode, so the workers do not need to import and run our scraper script again
+# Python 2 always uses 'fork' on Linux and Mac, Windows does not support it at all
+def make_pool(processes):
+    try:
+        return multiprocessing.get_context('fork').Pool(processes)
+    except (AttributeError, ValueError):
+        return multiprocessing.Pool(processes)
+
+
+# 'ParserPool' parses offers' details pages in 'workers' separate processes
+# With 'workers' set to 0 pages are parsed in the current process, which is handy for debugging
+# It should be created before any threads are started (for example before our 'Fetcher'), since forking a process with threads is not safe
+# 'metrics' (optional, 'otomoto_metrics.Metrics') gets parsing time of each page and counts of items which failed to convert
+class ParserPool(object):
+
+    def __init__(self, workers, metrics=None):
+        self.pool = make_pool(workers) if workers else None
+        self.metrics = metrics
+
+    # Parsing many pages at once, offers are returned in the same order as 'htmls', with 'ParseError' in place of each broken page
+    def parse_offers(self, htmls):
+        if (self.pool is None):
+            results = [parse_offer_measured(html) for html in htmls]
+        else:
+            results = self.pool.map(parse_offer_measured, htmls)
+        if (self.metrics is not None):
+            for offer, failures, seconds in results:
+                self.metrics.observe('parse', seconds)
+                if (isinstance(offer, ParseError)):
+                    # Only the kind of the error is used as a label, such as 'missing metabar' or 'AttributeError'
+                    self.metrics.increment('parse_errors', reason=str(offer).split(':')[0])
+                for key in failures:
+                    self.metrics.increment('parse_failures', field=key)
+        return [offer for offer, failures, seconds in results]
+
+    def close(self):
+        if (self.pool is not None):
+            self.pool.close()
+            self.pool.join()
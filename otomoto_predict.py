@@ -0,0 +1,204 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Saving a trained model and predicting prices with it, used by '2-otomoto-ml.py' and 'otomoto-predict-server.py'
+# A model is saved as a 'bundle' - a directory with everything we need to predict a price of an offer:
+# - 'model.joblib' - the trained model itself, saved without compression, so its arrays can be memory-mapped when loading
+# - 'vocabulary.json' - codes of categorical values the model was trained with
+# - 'bundle.json' - order of columns the model expects, and some information about the model
+# The bundle's directory is a symbolic link to a hidden directory holding one saved version of the bundle,
+# so that saving a model again never changes files a running 'otomoto-predict-server.py' has memory-mapped
+import os # used for building paths, creating bundle directories and swapping symbolic links
+import shutil # used for removing old versions of a bundle
+import json # information about the bundle is saved as a JSON file
+import time # used for measuring latency and for batching requests
+import threading # our batcher runs in its own thread
+import collections # 'deque' keeps only the latest latencies
+import joblib # saving and loading models, it's installed together with 'scikit-learn'
+import numpy as np # needed for calculating percentiles
+import otomoto_data # our own conversion of offers into typed columns
+from otomoto_encoder import CategoricalEncoder # our own conversion of categorical data into Integers
+
+# 'Queue' module was renamed to 'queue' in Python 3
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+# 'keep_versions' variable takes how many saved versions of a bundle are kept on disk, counting the current one
+# The previous version is kept so that a server which has just started loading it can finish reading its files
+keep_versions = 2
+
+
+# Hidden directories holding saved versions of the bundle in 'directory', sorted from the oldest one
+def bundle_versions(directory):
+    parent, name = os.path.split(os.path.normpath(directory))
+    prefix = '.' + name + '-'
+    return sorted(os.path.join(parent, entry) for entry in os.listdir(parent or '.')
+                  if entry.startswith(prefix) and entry[len(prefix):].isdigit())
+
+
+# Saving 'model' together with its 'encoder' and 'columns' order into 'directory'
+# 'metadata' can hold any other information worth keeping, such as model's score
+# Writing over 'model.joblib' in place would change arrays a running server has memory-mapped under its feet,
+# giving 'nan' prices or crashing it with 'SIGBUS', and a server starting in the middle of saving could pair the new model
+# with the old order of columns - so the whole bundle is written into a new hidden directory first,
+# and only then 'directory' (a symbolic link) is switched to it with 'os.rename', which is atomic
+# A server already running keeps its old files (they are removed from the disk only when nothing uses them anymore)
+def save_bundle(directory, model, encoder, columns, metadata=None):
+    directory = os.path.normpath(directory)
+    parent, name = os.path.split(directory)
+    if (parent and not os.path.isdir(parent)):
+        os.makedirs(parent)
+    # Bundles saved before we started keeping versions are plain directories, we move them aside as the oldest version
+    if (os.path.isdir(directory) and not os.path.islink(directory)):
+        os.rename(directory, os.path.join(parent, '.' + name + '-' + '0' * 13))
+    version = os.path.join(parent, '.' + name + '-' + str(int(time.time() * 1000)).zfill(13))
+    while (os.path.exists(version)):
+        version = version[:-13] + str(int(version[-13:]) + 1).zfill(13)
+    temporary = version + '.tmp'
+    if (os.path.exists(temporary)):
+        shutil.rmtree(temporary)
+    os.makedirs(temporary)
+    joblib.dump(model, os.path.join(temporary, 'model.joblib'))
+    encoder.save(os.path.join(temporary, 'vocabulary.json'))
+    bundle = dict(metadata or {})
+    bundle.update({'columns': list(columns),
+                   'model': repr(model),
+                   'vocabulary_revision': encoder.revision,
+                   'created': time.strftime('%Y-%m-%d %H:%M:%S')})
+    with open(os.path.join(temporary, 'bundle.json'), 'w') as bundle_file:
+        json.dump(bundle, bundle_file, indent=2)
+    os.rename(temporary, version)
+    # The link points to the version relatively, so the whole 'models' directory can be moved or copied
+    link = directory + '.link'
+    if (os.path.lexists(link)):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)
+    os.rename(link, directory)
+    for old_version in bundle_versions(directory)[:-keep_versions]:
+        shutil.rmtree(old_version)
+
+
+# 'PricePredictor' predicts prices of offers given in the same shape as 'db_record' of our scraper
+class PricePredictor(object):
+
+    def __init__(self, model, encoder, columns, metadata):
+        self.model = model
+        self.encoder = encoder
+        self.columns = columns
+        self.metadata = metadata
+
+    # Loading a bundle saved with 'save_bundle'
+    # With 'mmap_mode' set to 'r', big arrays of the model are mapped from the file instead of being copied into memory,
+    # but 'scikit-learn' still rebuilds each tree of a forest while loading, so it does not make loading instant:
+    # our 50 trees forest (434 MB, measured on random offers shaped like ours) loads in about 1.3s, and in about 1.9s without 'mmap_mode'
+    # The link is resolved once, so all files come from the same version even if the bundle is saved again meanwhile
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        directory = os.path.realpath(directory)
+        with open(os.path.join(directory, 'bundle.json')) as bundle_file:
+            metadata = json.load(bundle_file)
+        model = joblib.load(os.path.join(directory, 'model.joblib'), mmap_mode=mmap_mode)
+        encoder = CategoricalEncoder.load(os.path.join(directory, 'vocabulary.json'))
+        return cls(model, encoder, metadata['columns'], metadata)
+
+    # Predicting prices of a list of offers, returns a list of prices in PLN
+    def predict(self, records):
+        if (not records):
+            return []
+        features = self.encoder.transform(otomoto_data.documents_to_frame(records))[self.columns]
+        return [float(price) for price in self.model.predict(features)]
+
+
+# 'MicroBatcher' collects offers sent by many requests at the same time and predicts their prices with a single call of our model
+# Predicting 50 offers at once takes about as long as predicting one, so under load we answer many more requests per second
+# A batch is predicted as soon as it has 'max_batch' offers, or 'max_wait' seconds after its first offer came in
+class MicroBatcher(object):
+
+    def __init__(self, predictor, max_batch=64, max_wait=0.005):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    # Called by request handlers, waits until prices of given 'records' (a list of dictionaries) are predicted
+    def predict(self, records):
+        if (not isinstance(records, list) or not all(isinstance(record, dict) for record in records)):
+            raise ValueError('offers should be given as a list of dictionaries')
+        request = {'records': records, 'done': threading.Event()}
+        self.requests.put(request)
+        request['done'].wait()
+        if ('error' in request):
+            raise request['error']
+        return request['prices']
+
+    # Our batcher's thread, it collects requests and predicts them in batches
+    # Whatever goes wrong, the thread keeps running - otherwise all the following requests would wait forever
+    def run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self.requests.get())
+                size = len(batch[0]['records'])
+                deadline = time.time() + self.max_wait
+                while (size < self.max_batch):
+                    try:
+                        request = self.requests.get(timeout=max(0, deadline - time.time()))
+                    except queue.Empty:
+                        break
+                    batch.append(request)
+                    size += len(request['records'])
+                self.predict_batch(batch)
+            except Exception as error:
+                self.fail(batch, error)
+
+    # Giving 'error' to all the requests of 'batch' which are still waiting
+    def fail(self, batch, error):
+        for request in batch:
+            if (not request['done'].is_set()):
+                request['error'] = error
+                request['done'].set()
+
+    def predict_batch(self, batch):
+        try:
+            prices = self.predictor.predict([record for request in batch for record in request['records']])
+        except Exception as error:
+            # If a batch of many requests fails, each of them is predicted on its own,
+            # so only the request with a broken offer gets the error, not the others which happened to share its batch
+            if (len(batch) > 1):
+                for request in batch:
+                    self.predict_batch([request])
+            else:
+                self.fail(batch, error)
+            return
+        start = 0
+        for request in batch:
+            request['prices'] = prices[start:start + len(request['records'])]
+            start += len(request['records'])
+            request['done'].set()
+
+
+# 'LatencyTracker' remembers latencies of the latest 'size' requests and calculates their percentiles
+class LatencyTracker(object):
+
+    def __init__(self, size=10000):
+        self.latencies = collections.deque(maxlen=size)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.count += 1
+
+    # Returning given percentile (for example 50 or 99) in seconds, or None if there were no requests yet
+    def percentile(self, percent):
+        with self.lock:
+            latencies = list(self.latencies)
+        return float(np.percentile(latencies, percent)) if latencies else None
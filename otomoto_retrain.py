@@ -0,0 +1,76 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Updating our saved models with offers scraped since they were trained, used by 'otomoto-retrain.py'
+# Instead of training a model from scratch on all the offers, we train it further on new offers only:
+# - forests, extra trees, bagging and gradient boosting get a few more trees ('warm_start'), which are trained on new offers
+# - MLPRegressor is trained for a few more epochs on new offers ('partial_fit')
+# - our streaming Linear Regression just adds new offers to its sums ('partial_fit')
+# Each updated model is checked on held-out offers, and if it's not good enough, it's trained from scratch after all
+import time # used for measuring how long training takes
+from sklearn.base import clone # creates a fresh, not trained copy of a model
+from sklearn.neural_network import MLPRegressor # importing MLPRegressor model
+from sklearn.ensemble import RandomForestRegressor # importing RandomForestRegressor model
+from sklearn.ensemble import ExtraTreesRegressor # importing ExtraTreesRegressor model
+from sklearn.ensemble import GradientBoostingRegressor # importing GradientBoostingRegressor model
+from sklearn.ensemble import BaggingRegressor # importing BaggingRegressor model
+from otomoto_models import StreamingLinearRegression # our own Linear Regression which can be trained in steps
+
+# Models which can get more estimators with 'warm_start'
+WARM_START_MODELS = (RandomForestRegressor, ExtraTreesRegressor, BaggingRegressor, GradientBoostingRegressor)
+
+
+# Training 'model' further on new offers only, returns False if this kind of model can't be trained that way
+# 'growth' decides how many estimators are added - for example with 0.1, a forest of 50 trees gets 5 new ones
+# 'epochs' decides how many times MLPRegressor goes through new offers
+def incremental_fit(model, x_new, y_new, growth=0.1, epochs=5):
+    if (isinstance(model, WARM_START_MODELS)):
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + max(1, int(round(model.n_estimators * growth))))
+        model.fit(x_new, y_new)
+        return True
+    if (isinstance(model, MLPRegressor)):
+        for _ in range(epochs):
+            model.partial_fit(x_new, y_new)
+        return True
+    if (isinstance(model, StreamingLinearRegression)):
+        model.partial_fit(x_new, y_new)
+        return True
+    return False
+
+
+# Updating a saved 'model' with new offers, or training it from scratch if updating is not good enough
+# - 'base_model' is a fresh copy of the model from 'otomoto_models.saved_model', used when training from scratch
+# - 'x_train' / 'y_train' are all the training offers, 'x_new' / 'y_new' only those the model has not seen yet
+# - 'x_holdout' / 'y_holdout' are offers never used for training, the updated model is accepted,
+#   if its score on them is not lower than the score of the previous model by more than 'tolerance'
+# - 'max_growth' - once a model has more than 'max_growth' times estimators of 'base_model', it's trained from scratch,
+#   so it does not keep growing forever
+# - 'full_fit_seconds' - how long training from scratch took last time, used for reporting how much time we saved
+# Returns the new model and a dictionary describing what happened
+def retrain(model, base_model, x_train, y_train, x_new, y_new, x_holdout, y_holdout,
+            full_fit_seconds=None, tolerance=0.01, max_growth=2.0):
+    previous_score = model.score(x_holdout, y_holdout)
+    report = {'previous_score': previous_score, 'new_rows': len(x_new)}
+
+    start = time.time()
+    updated = incremental_fit(model, x_new, y_new)
+    report['incremental_seconds'] = time.time() - start
+    if (updated):
+        report['incremental_score'] = model.score(x_holdout, y_holdout)
+        too_big = hasattr(model, 'n_estimators') and model.n_estimators > max_growth * base_model.n_estimators
+        if (report['incremental_score'] >= previous_score - tolerance and not too_big):
+            report['mode'] = 'incremental'
+            report['score'] = report['incremental_score']
+            if (full_fit_seconds is not None):
+                report['saved_seconds'] = full_fit_seconds - report['incremental_seconds']
+            return model, report
+
+    # Updating was not possible or not good enough, training from scratch on all the offers
+    model = clone(base_model)
+    start = time.time()
+    model.fit(x_train, y_train)
+    report['full_fit_seconds'] = time.time() - start
+    report['mode'] = 'full'
+    report['score'] = model.score(x_holdout, y_holdout)
+    return model, report
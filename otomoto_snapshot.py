@@ -0,0 +1,143 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Snapshot of our training data, saved on disk in a columnar format (Arrow IPC files)
+# It holds offers already loaded from our database, with filled missing values and with categorical values converted into Integers,
+# so each Machine Learning experiment can start from it in seconds, instead of pulling and converting all the offers again
+# A snapshot is a directory with:
+# - 'part-00001.arrow', 'part-00002.arrow' and so on - each part holds offers added since the previous part was written,
+#   once there are more than 'max_parts' of them, they are merged into a single new part
+# - 'snapshot.json' - list of parts, number of rows and '_id' of the newest offer in the snapshot
+# MongoDB '_id' grows with the time an offer was saved, so offers with '_id' greater than the newest one are those we don't have yet
+# It's only roughly ordered though: '_id' starts with the second it was created in, followed by a value random for each writer process,
+# so offers saved in the same second by separate processes (such as our scraper threads' writers, or 'otomoto-reparse.py' running next to it)
+# can get '_id' lower than the newest one we already have, and would be missed
+# Offers can also be deleted, or inserted again with new '_id' ('otomoto-reparse.py' with 'drop_collection' set to True),
+# so before each update we check that the database still holds exactly the offers counted in our snapshot
+import os # used for building paths and creating the snapshot directory
+import json # information about the snapshot is saved as a JSON file
+import time # used for measuring how long loading takes
+import pyarrow as pa # columnar format of our snapshot, it needs to be installed with 'pip install pyarrow'
+from bson import ObjectId # type of MongoDB '_id', it's installed together with 'pymongo'
+import otomoto_data # our own loading of offers from the database into typed columns
+from otomoto_encoder import CategoricalEncoder # our own conversion of categorical data into Integers
+
+# Version of our snapshot format, it should be changed whenever the format changes
+SNAPSHOT_FORMAT = 1
+
+
+# Reading information about the snapshot in 'directory', or an empty snapshot if there is none yet
+def read_state(directory):
+    path = os.path.join(directory, 'snapshot.json')
+    if (not os.path.exists(path)):
+        return {'format': SNAPSHOT_FORMAT, 'parts': [], 'rows': 0, 'last_id': None}
+    with open(path) as state_file:
+        state = json.load(state_file)
+    if (state['format'] != SNAPSHOT_FORMAT):
+        raise ValueError('Unsupported snapshot format ' + str(state['format']) + ' in ' + directory)
+    return state
+
+
+# Saving information about the snapshot, it's written to a temporary file first, so a crash never leaves us with a broken snapshot
+def write_state(directory, state):
+    path = os.path.join(directory, 'snapshot.json')
+    with open(path + '.tmp', 'w') as state_file:
+        json.dump(state, state_file, indent=2)
+    os.rename(path + '.tmp', path)
+
+
+# Writing 'table' as a new part of the snapshot in 'directory', returns the name of the part
+# It's written to a temporary file first, it's added to the snapshot only once it's complete
+# Parts are numbered one after another, also after older parts were merged and removed
+def write_part(directory, state, table):
+    number = int(state['parts'][-1][len('part-'):-len('.arrow')]) + 1 if state['parts'] else 1
+    part = 'part-' + str(number).zfill(5) + '.arrow'
+    path = os.path.join(directory, part)
+    with pa.OSFile(path + '.tmp', 'wb') as part_file:
+        writer = pa.ipc.new_file(part_file, table.schema)
+        writer.write_table(table)
+        writer.close()
+    os.rename(path + '.tmp', path)
+    return part
+
+
+# Reading all the parts of the snapshot, memory-mapped, as a list of tables
+def read_parts(directory, state):
+    return [pa.ipc.open_file(pa.memory_map(os.path.join(directory, part), 'r')).read_all() for part in state['parts']]
+
+
+# Merging all the parts of the snapshot into a single new part, so 'load_snapshot' can read it without copying
+# Columns are put together from their parts once here, instead of every time the snapshot is loaded
+# Old parts are removed only after the new information about the snapshot is saved, so a crash never leaves us without our data
+def merge_parts(directory, state):
+    old_parts = list(state['parts'])
+    table = pa.concat_tables(read_parts(directory, state)).combine_chunks()
+    state['parts'] = [write_part(directory, state, table)]
+    write_state(directory, state)
+    for part in old_parts:
+        os.remove(os.path.join(directory, part))
+    print('Merged ' + str(len(old_parts)) + ' parts of snapshot into ' + state['parts'][0])
+
+
+# Adding offers which are not in the snapshot yet as a new part, returns the number of added offers
+# Categorical values are converted with the vocabulary saved in 'vocabulary_path', new values are added to it
+# Since the vocabulary only grows, codes saved in older parts are still valid
+# Once the snapshot has more than 'max_parts' parts, they are merged into one
+def update_snapshot(collection, directory, vocabulary_path, batch_size=5000, max_parts=1):
+    if (not os.path.isdir(directory)):
+        os.makedirs(directory)
+    state = read_state(directory)
+
+    # Our snapshot and the database must agree on how many offers are up to the newest one we have, otherwise some offers
+    # were missed, deleted or saved again, and adding only the newer ones would leave our snapshot with missing or duplicated rows
+    # Numbering of rows would change when building it again, and 'otomoto-retrain.py' relies on it, so we don't do it ourselves
+    if (state['last_id']):
+        expected = collection.count_documents({'_id': {'$lte': ObjectId(state['last_id'])}})
+        if (expected != state['rows']):
+            raise ValueError('Snapshot in ' + directory + ' has ' + str(state['rows']) + ' offers, but the database has ' + str(expected)
+                             + ' offers up to ' + state['last_id'] + ' - remove the snapshot to build it again'
+                             + ' and train the models from scratch with 2-otomoto-ml.py')
+
+    # Looking for the newest offer in our database first, so offers saved while we are loading wait for the next update
+    id_range = {'$gt': ObjectId(state['last_id'])} if state['last_id'] else {}
+    newest = list(collection.find({'_id': id_range} if id_range else {}, {'_id': 1}).sort('_id', -1).limit(1))
+    if (not newest):
+        print('Snapshot is up to date, ' + str(state['rows']) + ' offers')
+        return 0
+    id_range['$lte'] = newest[0]['_id']
+    df = otomoto_data.load_offers(collection, query={'_id': id_range}, batch_size=batch_size)
+
+    if (os.path.exists(vocabulary_path)):
+        encoder = CategoricalEncoder.load(vocabulary_path)
+    else:
+        encoder = CategoricalEncoder(otomoto_data.columns_list_categorical)
+    df = encoder.fit_transform(df)
+    encoder.save(vocabulary_path)
+
+    state['parts'].append(write_part(directory, state, pa.Table.from_pandas(df, preserve_index=False)))
+    state['rows'] += len(df)
+    state['last_id'] = str(newest[0]['_id'])
+    state['vocabulary_revision'] = encoder.revision
+    state['updated'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    write_state(directory, state)
+    print('Added ' + str(len(df)) + ' offers to snapshot, ' + str(state['rows']) + ' in total')
+    if (len(state['parts']) > max_parts):
+        merge_parts(directory, state)
+    return len(df)
+
+
+# Loading the whole snapshot as a DataFrame, with all the columns we use and the 'label' column
+# Parts are memory-mapped, so their data is not read or copied while opening them
+# With a single part (which is what 'update_snapshot' leaves us with), columns of our DataFrame point straight at the mapped file (zero copies),
+# with many parts (if 'max_parts' was raised), each column is put together from its parts once
+def load_snapshot(directory):
+    start = time.time()
+    state = read_state(directory)
+    if (not state['parts']):
+        raise ValueError('There is no snapshot in ' + directory + ', it can be created with otomoto-features-snapshot.py')
+    tables = read_parts(directory, state)
+    table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+    df = table.to_pandas(split_blocks=True)
+    print('Loaded ' + str(len(df)) + ' offers from snapshot in ' + str(round(time.time() - start, 2)) + 's, peak RSS: ' + str(otomoto_data.peak_rss_mb()) + ' MB')
+    return df
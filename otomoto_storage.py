@@ -0,0 +1,203 @@
+# coding: utf-8
+# ^^ Including the above line for setting up text coding to utf-8,
+# it's needed because we use Polish language in our code.
+
+# Helpers used by '1-otomoto-scraping.py' for talking to our 'offers' collection in MongoDB
+import time # used for flushing buffered records after some time, even if the buffer is not full
+from datetime import datetime # used for recording when a checkpoint was saved
+import pymongo # MongoDB client for Python, here we need it for index directions
+from pymongo import ReplaceOne # single 'replace' operation which can be sent in bulk
+from pymongo.errors import DuplicateKeyError # raised by MongoDB when a unique index would be broken
+from pymongo.errors import BulkWriteError # raised by MongoDB when some of bulk operations failed
+
+# Error code which MongoDB returns for documents that would break a unique index
+DUPLICATE_KEY_ERROR = 11000
+
+
+# 'OfferDeduplicator' makes sure we do not download and save the same offer twice
+# Offers are saved with their id under 'Otomoto id' key, so this is the key we keep a unique index on
+# Instead of asking the database about each offer separately, we ask about all offers of a list page in one query
+# and we remember every id we have already seen in 'known' set, so the same id is never looked up twice
+# Ids of offers saved during this run are also kept in 'added' set, so we can tell them apart from offers we had before
+class OfferDeduplicator(object):
+
+    def __init__(self, collection, key='Otomoto id'):
+        self.collection = collection
+        self.key = key
+        self.known = set()
+        self.added = set()
+
+    # Creating a unique index on offer's id, without it every lookup would scan the whole collection
+    # Before this index existed duplicates were never caught, so if some are already stored, we remove them first
+    def ensure_index(self):
+        try:
+            self.collection.create_index([(self.key, pymongo.ASCENDING)], unique=True)
+        except DuplicateKeyError:
+            removed = self.remove_duplicates()
+            print('Removed ' + str(removed) + ' duplicated offers before creating unique index')
+            self.collection.create_index([(self.key, pymongo.ASCENDING)], unique=True)
+
+    # Removing all but the first (the oldest) document for each duplicated offer's id
+    def remove_duplicates(self):
+        removed = 0
+        duplicates = self.collection.aggregate([
+            {'$group': {'_id': '$' + self.key, 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+            {'$match': {'count': {'$gt': 1}}},
+        ], allowDiskUse=True)
+        for duplicate in duplicates:
+            removed += self.collection.delete_many({'_id': {'$in': sorted(duplicate['ids'])[1:]}}).deleted_count
+        return removed
+
+    # Returning only those of 'ids' which are not in our database yet, keeping their order
+    # All ids we have not seen before are checked with a single '$in' query
+    def filter_new(self, ids):
+        unknown = [offer_id for offer_id in ids if offer_id not in self.known]
+        if (unknown):
+            for document in self.collection.find({self.key: {'$in': unknown}}, {self.key: 1, '_id': 0}):
+                self.known.add(document[self.key])
+        return [offer_id for offer_id in ids if offer_id not in self.known]
+
+    # Checking whether an offer was already seen, without asking the database
+    def is_known(self, offer_id):
+        return offer_id in self.known
+
+    # Remembering an offer, for example right after it was saved
+    def add(self, offer_id):
+        self.known.add(offer_id)
+        self.added.add(offer_id)
+
+    # Checking whether all 'ids' were in our database before this run, not just saved by it
+    # (they should be checked with 'filter_new' first)
+    def stored_before(self, ids):
+        return all(offer_id in self.known and offer_id not in self.added for offer_id in ids)
+
+
+# 'BulkOfferWriter' collects 'db_record' dictionaries and saves them to our database in batches
+# Saving each offer with its own 'insert_one' costs one round trip to the database per offer,
+# here we send up to 'batch_size' offers at once, or whatever we have collected in 'flush_interval' seconds
+# Writes are 'unordered', so one broken offer (for example a duplicate) does not stop the others from being saved
+# With 'upsert' switched on, offers are replaced by their 'Otomoto id' instead of being inserted, which is useful when we rebuild our data
+class BulkOfferWriter(object):
+
+    def __init__(self, collection, batch_size=500, flush_interval=10, upsert=False, key='Otomoto id', metrics=None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.upsert = upsert
+        self.key = key
+        self.buffer = []
+        self.last_flush = time.time()
+        # Helpers which show us how many offers were saved and how many were skipped as duplicates
+        self.written = 0
+        self.duplicates = 0
+        # Optional 'otomoto_metrics.Metrics', which gets timings of our bulk writes and counts of saved and duplicated offers
+        self.metrics = metrics
+
+    # Adding a record to the buffer, saving the whole buffer if it's full or if we waited long enough
+    def add(self, record):
+        self.buffer.append(record)
+        if (len(self.buffer) >= self.batch_size or time.time() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    # Saving everything we have in the buffer with a single bulk write
+    def flush(self):
+        records, self.buffer = self.buffer, []
+        self.last_flush = time.time()
+        if (not records):
+            return
+        written, duplicates = self.written, self.duplicates
+        try:
+            self.write(records)
+        finally:
+            if (self.metrics is not None):
+                self.metrics.observe('db_write', time.time() - self.last_flush)
+                self.metrics.increment('offers_saved', self.written - written)
+                self.metrics.increment('duplicates', self.duplicates - duplicates, stage='db_write')
+
+    # A single bulk write of 'records', counting saved and duplicated offers
+    def write(self, records):
+        try:
+            if (self.upsert):
+                result = self.collection.bulk_write([ReplaceOne({self.key: record[self.key]}, record, upsert=True) for record in records], ordered=False)
+                self.written += result.upserted_count + result.matched_count
+            else:
+                result = self.collection.insert_many(records, ordered=False)
+                self.written += len(result.inserted_ids)
+        except BulkWriteError as error:
+            # Since writes are unordered, all the other records were saved, we just need to find out what went wrong
+            details = error.details
+            self.written += details.get('nInserted', 0) + details.get('nUpserted', 0) + details.get('nMatched', 0)
+            duplicates = [write_error for write_error in details['writeErrors'] if write_error['code'] == DUPLICATE_KEY_ERROR]
+            # Duplicated offers are expected from time to time, we just skip them
+            self.duplicates += len(duplicates)
+            # Any other error is something we did not expect, so we don't want to hide it
+            if (len(duplicates) != len(details['writeErrors'])):
+                raise
+
+    # Saving whatever is left in the buffer, it should always be called when we finish
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# 'CheckpointStore' remembers how far our scraper got, so an interrupted crawl can continue where it stopped
+# Each checkpoint is a single document in 'collection' (we use 'checkpoints' collection), identified by its 'name'
+class CheckpointStore(object):
+
+    def __init__(self, collection, name='offers'):
+        self.collection = collection
+        self.name = name
+
+    # Returning saved state, or an empty dictionary if there is no checkpoint yet
+    def load(self):
+        return self.collection.find_one({'_id': self.name}, {'_id': 0}) or {}
+
+    # Saving given state, for example 'last_page', together with the time it was saved
+    def save(self, **state):
+        state['updated'] = datetime.utcnow()
+        self.collection.update_one({'_id': self.name}, {'$set': state}, upsert=True)
+
+    # Removing the checkpoint, so the next crawl starts from the beginning
+    def clear(self):
+        self.collection.delete_one({'_id': self.name})
+
+
+# 'DeadLetterQueue' keeps offers (and list pages) which could not be downloaded or parsed, so one broken page does not stop our crawl
+# Each of them is a single document in 'collection' (we use 'dead_letters' collection), identified by its url, with:
+# - 'stage' where it failed ('list_fetch', 'detail_fetch' or 'parse') and the 'reason' of the last failure
+# - 'item' - offer's data from its list page (price, location and so on), so the offer can be saved without its list page later
+# - 'attempts' - how many times it failed, together with the time of the first and the last failure
+# They are tried again with 'otomoto-replay-dead-letters.py'
+# 'metrics' (optional, 'otomoto_metrics.Metrics') gets counts of added documents by their 'stage'
+class DeadLetterQueue(object):
+
+    def __init__(self, collection, metrics=None):
+        self.collection = collection
+        self.metrics = metrics
+
+    def add(self, url, stage, reason, item=None):
+        if (self.metrics is not None):
+            self.metrics.increment('dead_letters', stage=stage)
+        now = datetime.utcnow()
+        self.collection.update_one({'_id': url},
+                                   {'$set': {'stage': stage, 'reason': reason, 'item': item, 'last_failed': now},
+                                    '$setOnInsert': {'first_failed': now},
+                                    '$inc': {'attempts': 1}},
+                                   upsert=True)
+
+    # Returning all the waiting documents which failed less than 'max_attempts' times, the oldest failures first
+    def pending(self, max_attempts=None):
+        query = {'attempts': {'$lt': max_attempts}} if max_attempts else {}
+        return list(self.collection.find(query).sort('first_failed', pymongo.ASCENDING))
+
+    # Removing a document, for example once it was finally saved
+    def remove(self, url):
+        self.collection.delete_one({'_id': url})
+
+    def count(self):
+        return self.collection.count_documents({})
@@ -0,0 +1,6 @@
+# coding: utf-8
+# Our modules live in the main directory of the repository, next to our scripts, so tests import them from there
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
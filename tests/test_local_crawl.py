@@ -0,0 +1,84 @@
+# coding: utf-8
+# Running one list page and its offers through our fetcher and parser, against our local stand-in server with recorded pages
+import io
+import os
+import threading
+import pytest
+import otomoto_archive
+import otomoto_fetch
+import otomoto_local_server
+import otomoto_parser
+
+PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+LIST_URL = 'https://www.otomoto.pl/osobowe/?search%5Border%5D=created_at_first%3Adesc&page='
+DETAIL_URL = 'https://www.otomoto.pl/oferta/'
+
+
+# A recorded page, in the same shape as a 'requests' response our scraper passes to its archive
+class RecordedResponse(object):
+
+    def __init__(self, path, status_code=200):
+        with io.open(os.path.join(PAGES, path), encoding='utf-8') as page_file:
+            self.text = page_file.read()
+        self.status_code = status_code
+
+
+@pytest.fixture
+def server(tmpdir):
+    archive = otomoto_archive.PageArchive(str(tmpdir))
+    archive.add('list', LIST_URL + '1', RecordedResponse('list.html'))
+    archive.add('detail', DETAIL_URL + 'audi-a4-ID6000000001.html', RecordedResponse('detail-6000000001.html'))
+    archive.add('detail', DETAIL_URL + 'opel-astra-ID6000000002.html', RecordedResponse('detail-6000000002.html'))
+    local_server = otomoto_local_server.make_server(otomoto_local_server.load_recorded_pages(str(tmpdir)), port=0)
+    thread = threading.Thread(target=local_server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield 'http://127.0.0.1:' + str(local_server.server_address[1])
+    local_server.shutdown()
+    local_server.server_close()
+
+
+def test_rewrite_host():
+    assert otomoto_fetch.rewrite_host(DETAIL_URL + 'audi.html?a=1', 'http://127.0.0.1:8080') == 'http://127.0.0.1:8080/oferta/audi.html?a=1'
+
+
+def test_one_page_end_to_end(server):
+    fetcher = otomoto_fetch.Fetcher(concurrency=2, requests_per_second=100, host=server, retries=0)
+    try:
+        response = fetcher.get(LIST_URL + '1', stage='list_fetch')
+        items = otomoto_parser.parse_list_page(response.text)
+        assert [item['id'] for item in items] == ['6000000001', '6000000002']
+        assert items[0]['url'] == DETAIL_URL + 'audi-a4-ID6000000001.html'
+        assert (items[0]['Cena'], items[0]['Miasto'], items[0]['Wojewodztwo']) == (32900, u'Warszawa', u'Mazowieckie')
+        assert items[1]['Cena'] == int(4500 * 4.27)
+
+        responses = fetcher.get_all([item['url'] for item in items])
+        offers = [otomoto_parser.parse_offer(link_response.text) for link_response in responses]
+        records = [otomoto_parser.build_record(item, offer) for item, offer in zip(items, offers)]
+    finally:
+        fetcher.close()
+
+    audi, opel = records
+    assert audi[u'Otomoto id'] == u'6000000001'
+    assert audi[u'Marka pojazdu'] == u'Audi'
+    assert audi[u'Przebieg'] == 150000
+    assert audi[u'Pojemność skokowa'] == 1968
+    assert audi[u'Moc'] == 143
+    assert audi[u'Rok produkcji'] == 2010
+    assert audi[u'Bezwypadkowy'] == 1
+    assert audi[u'Wyposażenie: Klimatyzacja automatyczna'] == 1
+    assert audi[u'Opis'] == u'Samochód w dobrym stanie.'
+    assert audi[u'Url'] == DETAIL_URL + 'audi-a4-ID6000000001.html'
+    assert opel[u'Otomoto id'] == u'6000000002'
+    assert opel[u'Metalik'] == 1
+    assert opel[u'Miasto'] == u'Kraków'
+
+
+def test_page_which_was_not_recorded(server):
+    fetcher = otomoto_fetch.Fetcher(host=server, retries=0)
+    try:
+        response = fetcher.get(LIST_URL + '2', stage='list_fetch')
+    finally:
+        fetcher.close()
+    assert response.status_code == 404
+    assert otomoto_parser.parse_list_page(response.text) == []
@@ -0,0 +1,36 @@
+# coding: utf-8
+# Checking that our streaming Linear Regression gives the same predictions as 'LinearRegression' from 'scikit-learn'
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from otomoto_models import StreamingLinearRegression
+
+
+# Random offers shaped like ours: a few numbers with very different scales (mileage, year, power and so on),
+# many 0 / 1 flags (one of them never set) and categorical codes
+def make_offers(count=20000, seed=0):
+    rng = np.random.RandomState(seed)
+    numbers = np.column_stack([rng.uniform(0, 1e6, count), rng.randint(1990, 2020, count), rng.uniform(50, 400, count),
+                               rng.uniform(900, 5000, count), rng.randint(2, 6, count), rng.randint(2, 9, count)])
+    flags = (rng.rand(count, 40) < 0.3).astype(np.float64)
+    flags[:, 3] = 0
+    categories = rng.randint(0, 50, (count, 10)).astype(np.float64)
+    x = np.hstack([numbers, flags, categories])
+    y = 800 * (numbers[:, 1] - 2000) - 0.05 * numbers[:, 0] + x.dot(rng.randn(x.shape[1])) * 100 + rng.randn(count) * 1000
+    return x, y
+
+
+def test_fit_matches_linear_regression():
+    x, y = make_offers()
+    expected = LinearRegression().fit(x, y).predict(x)
+    predicted = StreamingLinearRegression().fit(x, y).predict(x)
+    assert np.allclose(predicted, expected, rtol=0, atol=1e-3 * np.abs(expected).max())
+
+
+def test_partial_fit_in_chunks_matches_linear_regression():
+    x, y = make_offers()
+    expected = LinearRegression().fit(x, y).predict(x)
+    model = StreamingLinearRegression()
+    for start in range(0, len(x), 3000):
+        model.partial_fit(x[start:start + 3000], y[start:start + 3000])
+    assert model.n_samples_seen_ == len(x)
+    assert np.allclose(model.predict(x), expected, rtol=0, atol=1e-3 * np.abs(expected).max())
@@ -0,0 +1,40 @@
+# coding: utf-8
+# Checking that saving a model again does not change a model already loaded (memory-mapped) from the same bundle
+import os
+import numpy as np
+from sklearn.neural_network import MLPRegressor
+import otomoto_predict
+from otomoto_encoder import CategoricalEncoder
+
+
+def fit_model(seed):
+    rng = np.random.RandomState(seed)
+    x = rng.rand(500, 5)
+    y = x.dot(rng.rand(5)) * 1000
+    return MLPRegressor(hidden_layer_sizes=(64,), max_iter=50, random_state=seed).fit(x, y), x
+
+
+def test_save_keeps_loaded_model(tmpdir):
+    directory = os.path.join(str(tmpdir), 'models', 'mlp')
+    encoder = CategoricalEncoder(['make'])
+    model, x = fit_model(0)
+    otomoto_predict.save_bundle(directory, model, encoder, ['a', 'b', 'c', 'd', 'e'])
+    predictor = otomoto_predict.PricePredictor.load(directory)
+    expected = predictor.model.predict(x)
+
+    for seed in (1, 2, 3):
+        otomoto_predict.save_bundle(directory, fit_model(seed)[0], encoder, ['a', 'b', 'c', 'd', 'e'], {'seed': seed})
+    assert np.array_equal(predictor.model.predict(x), expected)
+    # Only the link and the versions we keep are left in the 'models' directory
+    assert len(otomoto_predict.bundle_versions(directory)) == otomoto_predict.keep_versions
+    assert otomoto_predict.PricePredictor.load(directory).metadata['seed'] == 3
+
+
+def test_save_over_plain_directory(tmpdir):
+    directory = os.path.join(str(tmpdir), 'mlp')
+    os.makedirs(directory)
+    open(os.path.join(directory, 'model.joblib'), 'w').close()
+    model, x = fit_model(0)
+    otomoto_predict.save_bundle(directory, model, CategoricalEncoder(['make']), ['a', 'b', 'c', 'd', 'e'])
+    assert os.path.islink(directory)
+    assert np.allclose(otomoto_predict.PricePredictor.load(directory).model.predict(x), model.predict(x))